@@ -1,15 +1,35 @@
+import numpy as np
 import pandas as pd
 import psycopg2
-from dash import Dash, html, dcc, Input, Output, State, callback, Patch
+import psycopg2.extensions
+import psycopg2.pool
+from dash import Dash, html, dcc, Input, Output, State, callback, ctx, Patch, no_update
+from dash.exceptions import PreventUpdate
+from flask import request, jsonify, send_from_directory, abort
 import dash_bootstrap_components as dbc
 import dash_ag_grid as dag
 import plotly.graph_objects as go
-import plotly.express as px
+from plotly.utils import PlotlyJSONEncoder
+import contextlib
+import hashlib
+import hmac
+import itertools
+import json
+import logging
 import os
+import pickle
 import re
+import select
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict, deque
 from dotenv import load_dotenv
 from unidecode import unidecode
 
+logger = logging.getLogger(__name__)
+
 # Dash app
 app = Dash(external_stylesheets=[dbc.themes.BOOTSTRAP])
 server = app.server
@@ -25,29 +45,1086 @@ POSTGRES_DB_NAME = os.getenv('POSTGRES_DB_NAME')
 POSTGRES_DB_USER = os.getenv('POSTGRES_DB_USER')
 POSTGRES_DB_PASSWORD = os.getenv('POSTGRES_DB_PASSWORD')
 
+# Read replicas (comma separated libpq DSNs) and the staleness they may serve
+POSTGRES_REPLICA_DSNS = [dsn.strip() for dsn in os.getenv('POSTGRES_REPLICA_DSNS', '').split(',') if dsn.strip()]
+MAX_REPLICA_LAG_SECONDS = float(os.getenv('MAX_REPLICA_LAG_SECONDS', '30'))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv('REPLICA_LAG_CHECK_SECONDS', '10'))
+# Longer than the primary's keepalive interval (wal_sender_timeout / 2)
+REPLICA_STREAM_TIMEOUT_SECONDS = float(os.getenv('REPLICA_STREAM_TIMEOUT_SECONDS', '60'))
+
+# Query deadlines (milliseconds) and circuit breaker settings
+CONNECT_TIMEOUT_SECONDS = int(os.getenv('CONNECT_TIMEOUT_SECONDS', '5'))
+STATEMENT_TIMEOUT_MS = int(os.getenv('STATEMENT_TIMEOUT_MS', '5000'))
+SEARCH_TIMEOUT_MS = int(os.getenv('SEARCH_TIMEOUT_MS', '1000'))
+ROLLUP_TIMEOUT_MS = int(os.getenv('ROLLUP_TIMEOUT_MS', '120000'))
+CIRCUIT_WINDOW_SECONDS = int(os.getenv('CIRCUIT_WINDOW_SECONDS', '30'))
+CIRCUIT_MIN_QUERIES = int(os.getenv('CIRCUIT_MIN_QUERIES', '10'))
+CIRCUIT_ERROR_RATE = float(os.getenv('CIRCUIT_ERROR_RATE', '0.5'))
+CIRCUIT_COOLDOWN_SECONDS = int(os.getenv('CIRCUIT_COOLDOWN_SECONDS', '15'))
+
+# Connections kept per database (primary and each replica) in every worker
+POOL_MAX_CONNECTIONS = int(os.getenv('POOL_MAX_CONNECTIONS', '20'))
+# How long a query waits for a free pooled connection when all are in use
+POOL_WAIT_SECONDS = float(os.getenv('POOL_WAIT_SECONDS', '5'))
+
+# Fetched frames above this size are logged as a warning
+FRAME_MEMORY_BUDGET_BYTES = int(os.getenv('FRAME_MEMORY_BUDGET_BYTES', str(256 * 1024 * 1024)))
+
+# Daily rollup and cube refresh settings
+ROLLUP_REFRESH_SECONDS = int(os.getenv('ROLLUP_REFRESH_SECONDS', '300'))
+ROLLUP_LOOKBACK_DAYS = int(os.getenv('ROLLUP_LOOKBACK_DAYS', '2'))
+
+# Push invalidation through LISTEN/NOTIFY, falls back to the refresh interval
+DASHBOARD_LISTEN = os.getenv('DASHBOARD_LISTEN', '1') == '1'
+
+# Cold-start mode: serve the cubes saved in the snapshot file right away and
+# prepare the database and fresh data in the background
+COLD_START = os.getenv('COLD_START', '0') == '1'
+# Files the dashboard writes for itself go to the user's cache, not the checkout
+CACHE_DIR = os.getenv('DASHBOARD_CACHE_DIR', os.path.join(os.getenv('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'onoff-dashboard'))
+DASHBOARD_SNAPSHOT = os.getenv('DASHBOARD_SNAPSHOT', os.path.join(CACHE_DIR, 'dashboard_snapshot.pickle'))
+DASHBOARD_CHANNEL = 'dashboard_changes'
+
+# Singer picker settings
+SINGER_SEARCH_LIMIT = int(os.getenv('SINGER_SEARCH_LIMIT', '20'))
+SINGER_SEARCH_DEBOUNCE_SECONDS = float(os.getenv('SINGER_SEARCH_DEBOUNCE_SECONDS', '0.3'))
+# Singers the comparison chart can show side by side
+SINGER_COMPARE_MAX = int(os.getenv('SINGER_COMPARE_MAX', '5'))
+
+# Drill-down grid block size (rows fetched per request)
+DRILLDOWN_BLOCK_SIZE = int(os.getenv('DRILLDOWN_BLOCK_SIZE', '100'))
+
+# Values shown by the high-cardinality panels, the rest is summed into one
+# OTHER_LABEL bar, row or tile (the drill-down lists it in full)
+EXTENSION_TOP_N = int(os.getenv('EXTENSION_TOP_N', '20'))
+GENRE_TOP_N = int(os.getenv('GENRE_TOP_N', '20'))
+OTHER_LABEL = 'Autres'
+
+# Live mode: open dashboards poll the data version and receive patches for the
+# panels whose numbers changed
+LIVE_POLL_SECONDS = float(os.getenv('LIVE_POLL_SECONDS', '15'))
+LIVE_MODE_DEFAULT = os.getenv('LIVE_MODE_DEFAULT', '0') == '1'
+
+# Profiling is off unless an admin token is set; requests sending it in the
+# X-Profile-Token header are sampled and can read /_profile/*
+PROFILE_ADMIN_TOKEN = os.getenv('PROFILE_ADMIN_TOKEN', '')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(CACHE_DIR, 'profiles'))
+# Flame graphs kept on disk, the oldest are removed first
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '50'))
+PROFILE_SAMPLE_INTERVAL_SECONDS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_SECONDS', '0.005'))
+PROFILE_HISTORY = int(os.getenv('PROFILE_HISTORY', '1000'))
+PROFILE_TOP_N = int(os.getenv('PROFILE_TOP_N', '20'))
+
 on_off_head = html.H1("OnOff Data visualisation", className="bg-secondary text-white p-2")
 
-def fetch_data(query):
-    with psycopg2.connect(
-        dbname=POSTGRES_DB_NAME,
-        user=POSTGRES_DB_USER,
-        password=POSTGRES_DB_PASSWORD,
-        host=POSTGRES_DB_HOST,
-        port=POSTGRES_PORT,
-    ) as conn:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            return pd.DataFrame(results, columns=columns)
-
-def singer_gender_graph():
-    df = fetch_data("""
-        SELECT name, gender
+class DatabaseUnavailable(Exception):
+    pass
+
+class QuerySuperseded(Exception):
+    pass
+
+class PoolExhausted(DatabaseUnavailable):
+    # Every pooled connection stayed busy: not a database failure
+    pass
+
+class CircuitBreaker:
+    # Opens for `cooldown` seconds when the error rate over the last `window`
+    # seconds crosses `error_rate`, then lets queries probe the database again
+
+    def __init__(self, window, min_queries, error_rate, cooldown):
+        self.window = window
+        self.min_queries = min_queries
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.outcomes = deque()
+        self.open_until = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        return time.monotonic() >= self.open_until
+
+    def record(self, ok):
+        now = time.monotonic()
+        with self.lock:
+            self.outcomes.append((now, ok))
+            while self.outcomes and self.outcomes[0][0] < now - self.window:
+                self.outcomes.popleft()
+            failures = sum(1 for _, outcome in self.outcomes if not outcome)
+            if len(self.outcomes) >= self.min_queries and failures / len(self.outcomes) >= self.error_rate:
+                logger.warning("Database error rate %.0f%%, shedding queries for %ss", 100 * failures / len(self.outcomes), self.cooldown)
+                self.open_until = now + self.cooldown
+                self.outcomes.clear()
+
+circuit_breaker = CircuitBreaker(CIRCUIT_WINDOW_SECONDS, CIRCUIT_MIN_QUERIES, CIRCUIT_ERROR_RATE, CIRCUIT_COOLDOWN_SECONDS)
+
+# Stage timings of the layout build or callback running on this thread
+_request_timing = threading.local()
+_request_timings = deque(maxlen=PROFILE_HISTORY)
+
+@contextlib.contextmanager
+def stage(name):
+    # Adds the time spent in `name`, minus nested stages, to the current request
+    record = getattr(_request_timing, 'record', None)
+    if record is None:
+        yield
+        return
+    nested = record['nested']
+    nested.append(0.0)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        record['stages'][name] += elapsed - nested.pop()
+        if nested:
+            nested[-1] += elapsed
+
+class StackSampler:
+    # Samples the Python stack of one thread and counts folded stacks, the
+    # input format of flamegraph.pl and speedscope
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+# In-flight query per cancel key (callback and session): a newer query with the
+# same key cancels the previous one
+_inflight_lock = threading.Lock()
+_inflight = {}
+_superseded = set()
+
+def start_query(cancel_key, conn):
+    with _inflight_lock:
+        previous = _inflight.get(cancel_key)
+        _inflight[cancel_key] = conn
+        if previous is not None:
+            _superseded.add(previous)
+            previous.cancel()
+
+def finish_query(cancel_key, conn):
+    with _inflight_lock:
+        if _inflight.get(cancel_key) is conn:
+            del _inflight[cancel_key]
+        superseded = conn in _superseded
+        _superseded.discard(conn)
+    return superseded
+
+def connect_kwargs(dsn=None):
+    # The primary unless a replica DSN is given
+    if dsn is not None:
+        return {'dsn': dsn, 'connect_timeout': CONNECT_TIMEOUT_SECONDS}
+    return {
+        'dbname': POSTGRES_DB_NAME,
+        'user': POSTGRES_DB_USER,
+        'password': POSTGRES_DB_PASSWORD,
+        'host': POSTGRES_DB_HOST,
+        'port': POSTGRES_PORT,
+        'connect_timeout': CONNECT_TIMEOUT_SECONDS,
+    }
+
+def connect(dsn=None):
+    return psycopg2.connect(**connect_kwargs(dsn))
+
+class PreparedConnection(psycopg2.extensions.connection):
+    # Remembers the statements PREPAREd in its session
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+class BoundedConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    # getconn waits up to POOL_WAIT_SECONDS for a free connection instead of
+    # raising PoolError as soon as maxconn are checked out
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.available = threading.BoundedSemaphore(self.maxconn)
+
+    def getconn(self, key=None):
+        if not self.available.acquire(timeout=POOL_WAIT_SECONDS):
+            raise PoolExhausted(f"No free database connection after {POOL_WAIT_SECONDS}s")
+        try:
+            return super().getconn(key)
+        except BaseException:
+            self.available.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self.available.release()
+
+_pools_lock = threading.Lock()
+_pools = {}
+_pools_pid = None
+
+def get_pool(dsn=None):
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Connections inherited through a fork belong to the parent
+            _pools.clear()
+            _pools_pid = os.getpid()
+        if dsn not in _pools:
+            conn_pool = BoundedConnectionPool(
+                0,
+                POOL_MAX_CONNECTIONS,
+                connection_factory=PreparedConnection,
+                **connect_kwargs(dsn)
+            )
+            # Connect lazily but keep returned connections (and their prepared statements) idle
+            conn_pool.minconn = POOL_MAX_CONNECTIONS
+            _pools[dsn] = conn_pool
+        return _pools[dsn]
+
+# Hot dashboard queries, PREPAREd once per pooled connection and run with EXECUTE
+PREPARED_QUERIES = {
+    'first_singer': """
+        SELECT name
         FROM singers
+        WHERE name <> 'scraper'
+        ORDER BY id
+        LIMIT 1
+    """,
+    'singer_projects_by_language': """
+        SELECT po.language, count(po.title) AS project_count
+        FROM
+            singers s
+        JOIN
+            project_singer_association psa ON s.id = psa.singer_id
+        JOIN
+            project_observations po ON psa.project_observation_id = po.id
+        WHERE s.name = $1 AND s.is_active = po.is_active AND s.name <> 'scraper'
+          AND po.language IS NOT NULL
+          AND ($2::date IS NULL OR po.created_at >= $2::date)
+          AND ($3::date IS NULL OR po.created_at < $3::date + 1)
+        GROUP BY po.language
+        ORDER BY po.language
+    """,
+    'singers_projects_by_language': """
+        SELECT s.name, po.language, count(po.title) AS project_count
+        FROM
+            singers s
+        JOIN
+            project_singer_association psa ON s.id = psa.singer_id
+        JOIN
+            project_observations po ON psa.project_observation_id = po.id
+        WHERE s.name = ANY($1::text[]) AND s.is_active = po.is_active AND s.name <> 'scraper'
+          AND po.language IS NOT NULL
+          AND ($2::date IS NULL OR po.created_at >= $2::date)
+          AND ($3::date IS NULL OR po.created_at < $3::date + 1)
+        GROUP BY s.name, po.language
+    """,
+}
+
+# Recent EXECUTE durations (seconds) per prepared statement
+STATEMENT_TIMINGS_MAX = 1000
+_statement_timings = {name: deque(maxlen=STATEMENT_TIMINGS_MAX) for name in PREPARED_QUERIES}
+
+def statement_stats():
+    stats = {}
+    for name, timings in _statement_timings.items():
+        durations = np.array(timings) * 1000
+        if len(durations):
+            stats[name] = {
+                'count': len(durations),
+                'p50_ms': float(np.percentile(durations, 50)),
+                'p95_ms': float(np.percentile(durations, 95)),
+                'max_ms': float(durations.max()),
+            }
+    return stats
+
+# Replication lag in seconds per replica, None until checked or while unreachable
+_replica_lags = {}
+_replica_turn = itertools.count()
+_replica_monitor_pid = None
+
+def replica_lag(dsn):
+    conn = connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            # A replica still streaming from the primary, which replayed up to
+            # the last WAL position the primary reported, is not lagging even
+            # if the primary has been idle since the last transaction. Without
+            # a live stream (or the rights to see it) fall back to the age of
+            # the last replayed transaction.
+            cursor.execute("""
+                SELECT CASE
+                    WHEN NOT pg_is_in_recovery() THEN 0
+                    WHEN receiver.status = 'streaming'
+                        AND receiver.last_msg_receipt_time >= now() - make_interval(secs => %s)
+                        AND pg_last_wal_replay_lsn() >= receiver.latest_end_lsn
+                        THEN 0
+                    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 'Infinity')
+                END
+                FROM (SELECT 1) AS one
+                LEFT JOIN pg_stat_wal_receiver AS receiver ON true
+            """, (REPLICA_STREAM_TIMEOUT_SECONDS,))
+            return float(cursor.fetchone()[0])
+    finally:
+        conn.close()
+
+def mark_replica_down(dsn):
+    if _replica_lags.get(dsn) is not None:
+        logger.warning("Read replica unreachable, reading from the primary")
+    _replica_lags[dsn] = None
+
+def monitor_replicas():
+    while True:
+        for dsn in POSTGRES_REPLICA_DSNS:
+            try:
+                _replica_lags[dsn] = replica_lag(dsn)
+            except psycopg2.Error:
+                mark_replica_down(dsn)
+        time.sleep(REPLICA_LAG_CHECK_SECONDS)
+
+def read_dsn():
+    # Round-robin over replicas within MAX_REPLICA_LAG_SECONDS, None for the primary
+    global _replica_monitor_pid
+    if not POSTGRES_REPLICA_DSNS:
+        return None
+    if _replica_monitor_pid != os.getpid():
+        _replica_monitor_pid = os.getpid()
+        threading.Thread(target=monitor_replicas, name='replica-monitor', daemon=True).start()
+    fresh = [
+        dsn for dsn in POSTGRES_REPLICA_DSNS
+        if _replica_lags.get(dsn) is not None and _replica_lags[dsn] <= MAX_REPLICA_LAG_SECONDS
+    ]
+    if not fresh:
+        return None
+    return fresh[next(_replica_turn) % len(fresh)]
+
+def apply_schema(df, schema, label):
+    # `schema` maps columns to dtypes: `category` for low-cardinality text,
+    # compact ints for ids and counts
+    if schema:
+        df = df.astype({column: dtype for column, dtype in schema.items() if column in df.columns})
+    memory = int(df.memory_usage(deep=True).sum())
+    if memory > FRAME_MEMORY_BUDGET_BYTES:
+        logger.warning("Query %s returned %d rows using %d bytes, over the %d bytes budget", label, len(df), memory, FRAME_MEMORY_BUDGET_BYTES)
+    else:
+        logger.debug("Query %s returned %d rows using %d bytes", label, len(df), memory)
+    return df
+
+def run_query(query, params=None, timeout_ms=STATEMENT_TIMEOUT_MS, cancel_key=None, fetch=True, replica=False, statement=None, schema=None):
+    # `statement` runs the named PREPARED_QUERIES entry instead of `query`
+    if not circuit_breaker.allow():
+        raise DatabaseUnavailable("Database circuit open")
+    dsn = read_dsn() if replica else None
+    conn_pool = get_pool(dsn)
+    conn = None
+    broken = False
+    superseded = False
+    try:
+        with stage('sql'):
+            try:
+                conn = conn_pool.getconn()
+            except psycopg2.OperationalError:
+                if dsn is None:
+                    raise
+                mark_replica_down(dsn)
+                conn_pool = get_pool()
+                conn = conn_pool.getconn()
+            if cancel_key is not None:
+                start_query(cancel_key, conn)
+            with conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+                    if statement is None:
+                        cursor.execute(query, params)
+                    else:
+                        if statement not in conn.prepared:
+                            cursor.execute(f"PREPARE {statement} AS {PREPARED_QUERIES[statement]}")
+                            conn.prepared.add(statement)
+                        params = tuple(params or ())
+                        started = time.perf_counter()
+                        cursor.execute(f"EXECUTE {statement}({', '.join(['%s'] * len(params))})" if params else f"EXECUTE {statement}", params)
+                        _statement_timings[statement].append(time.perf_counter() - started)
+                    if fetch:
+                        results = cursor.fetchall()
+                        columns = [desc[0] for desc in cursor.description]
+                        df = pd.DataFrame(results, columns=columns)
+        circuit_breaker.record(True)
+        return apply_schema(df, schema, statement or ' '.join(query.split())[:80]) if fetch else None
+    except psycopg2.Error as error:
+        # Drop connections that failed outside of a cancelled statement
+        broken = conn is not None and (
+            bool(conn.closed)
+            or (isinstance(error, psycopg2.OperationalError) and not isinstance(error, psycopg2.extensions.QueryCanceledError))
+        )
+        if conn is not None and cancel_key is not None:
+            superseded = finish_query(cancel_key, conn)
+            if superseded:
+                raise QuerySuperseded() from None
+        circuit_breaker.record(False)
+        raise
+    finally:
+        if conn is not None:
+            if cancel_key is not None:
+                superseded = finish_query(cancel_key, conn) or superseded
+            # A cancel racing the end of its query could hit the connection's next user
+            conn_pool.putconn(conn, close=broken or superseded)
+
+@contextlib.contextmanager
+def transaction():
+    # A transaction on a dedicated connection (DDL, rollup refresh), counted by
+    # the circuit breaker like the pooled queries
+    if not circuit_breaker.allow():
+        raise DatabaseUnavailable("Database circuit open")
+    try:
+        conn = connect()
+    except psycopg2.Error:
+        circuit_breaker.record(False)
+        raise
+    try:
+        with conn:
+            yield conn
+        circuit_breaker.record(True)
+    except psycopg2.Error:
+        circuit_breaker.record(False)
+        raise
+    finally:
+        conn.close()
+
+def fetch_data(query, params=None, timeout_ms=STATEMENT_TIMEOUT_MS, cancel_key=None, replica=True, schema=None):
+    # Read-only queries go to a fresh enough replica when there is one
+    return run_query(query, params, timeout_ms, cancel_key, replica=replica, schema=schema)
+
+def fetch_prepared(statement, params=(), timeout_ms=STATEMENT_TIMEOUT_MS, cancel_key=None, replica=True, schema=None):
+    return run_query(None, params, timeout_ms, cancel_key, replica=replica, statement=statement, schema=schema)
+
+def execute(query, params=None, timeout_ms=STATEMENT_TIMEOUT_MS):
+    run_query(query, params, timeout_ms, fetch=False)
+
+# Daily rollup of the dashboard joins: one row per day and dimension values,
+# so any date range only sums a few thousand rows instead of scanning the joins.
+# `row_count` counts rows of the singer/file join (file panels), `project_count`
+# counts each project once, on its first joined row (project panels), and
+# `category_project_count` once per file category, on its first row in the
+# category (project panels filtered on a file category).
+ROLLUP_DIMENSIONS = ['language', 'song_type', 'style', 'genre', 'file_category', 'file_type', 'extension']
+ROLLUP_MEASURES = ['row_count', 'project_count', 'category_project_count']
+ROLLUP_SCHEMA = {
+    'day': 'datetime64[ns]',
+    **{dimension: 'category' for dimension in ROLLUP_DIMENSIONS},
+    **{measure: 'int32' for measure in ROLLUP_MEASURES},
+}
+
+# Genre picked per file category: "deliverable genre | references genre"
+# keeps the side matching the file.
+GENRE_SQL = """
+    CASE
+        WHEN position('|' IN po.genres) = 0 THEN po.genres
+        WHEN f.file_category = 'DELIVERABLE' THEN btrim(split_part(po.genres, '|', 1))
+        WHEN f.file_category = 'REFERENCES' THEN btrim(split_part(po.genres, '|', 2))
+    END
+"""
+
+SCHEMA_OBJECTS = ['project_daily_rollup', 'project_daily_rollup_day_idx', 'genre_canonical', 'genre_aliases', 'genre_mapping']
+
+def ensure_schema():
+    # Workers boot concurrently: the DDL runs under an advisory lock, and not at
+    # all once everything exists so that a read-only role can start too
+    with transaction() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = %s", (ROLLUP_TIMEOUT_MS,))
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('dashboard_schema'))")
+            cursor.execute("""
+                SELECT bool_and(to_regclass(name) IS NOT NULL) AND EXISTS (
+                    SELECT 1 FROM pg_attribute
+                    WHERE attrelid = to_regclass('project_daily_rollup') AND attname = 'category_project_count'
+                )
+                FROM unnest(%s::text[]) AS name
+            """, (SCHEMA_OBJECTS,))
+            if cursor.fetchone()[0]:
+                return
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS project_daily_rollup (
+                    day date,
+                    language text,
+                    song_type text,
+                    style text,
+                    genre text,
+                    file_category text,
+                    file_type text,
+                    extension text,
+                    row_count integer NOT NULL,
+                    project_count integer NOT NULL,
+                    category_project_count integer NOT NULL
+                );
+                -- Measure added after the first rollups, rebuilt by the next refresh
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 FROM pg_attribute
+                        WHERE attrelid = 'project_daily_rollup'::regclass AND attname = 'category_project_count'
+                    ) THEN
+                        ALTER TABLE project_daily_rollup ADD COLUMN category_project_count integer NOT NULL DEFAULT 0;
+                        DELETE FROM project_daily_rollup;
+                    END IF;
+                END
+                $$;
+                CREATE INDEX IF NOT EXISTS project_daily_rollup_day_idx ON project_daily_rollup (day);
+                -- Canonical genre of each raw rollup genre (genres_preprocessing), filled
+                -- for new raw values only; truncate it after changing genres_preprocessing
+                CREATE TABLE IF NOT EXISTS genre_canonical (
+                    raw_genre text PRIMARY KEY,
+                    preprocessed text NOT NULL
+                );
+                -- Manual overrides of a preprocessed genre, e.g. 'hiphop' -> 'hip hop'
+                CREATE TABLE IF NOT EXISTS genre_aliases (
+                    alias text PRIMARY KEY,
+                    canonical_genre text NOT NULL
+                );
+                CREATE OR REPLACE VIEW genre_mapping AS
+                    SELECT gc.raw_genre, COALESCE(ga.canonical_genre, gc.preprocessed) AS genre
+                    FROM genre_canonical gc
+                    LEFT JOIN genre_aliases ga ON ga.alias = gc.preprocessed;
+            """)
+
+# Indexes on the application tables, built without blocking their writes
+CONCURRENT_INDEXES = {
+    # Prefix search of the singer picker
+    'singers_name_prefix_idx': "singers (lower(name) text_pattern_ops)",
+    # Keyset pagination of the drill-down grid
+    'project_observations_created_at_id_idx': "project_observations (created_at, id)",
+}
+
+def ensure_concurrent_indexes():
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction: autocommit, under
+    # a session advisory lock so that one worker builds while the others carry
+    # on. A build interrupted half way leaves an invalid index, rebuilt here.
+    conn = None
+    try:
+        conn = connect()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext('dashboard_indexes'))")
+            if not cursor.fetchone()[0]:
+                return
+            try:
+                cursor.execute("""
+                    SELECT name FROM unnest(%s::text[]) AS name
+                    WHERE NOT EXISTS (SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(name) AND indisvalid)
+                """, (list(CONCURRENT_INDEXES),))
+                for name, in cursor.fetchall():
+                    logger.info("Building index %s", name)
+                    cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                    cursor.execute(f"CREATE INDEX CONCURRENTLY {name} ON {CONCURRENT_INDEXES[name]}")
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(hashtext('dashboard_indexes'))")
+    except psycopg2.Error:
+        logger.warning("Could not build the dashboard indexes", exc_info=True)
+    finally:
+        if conn is not None:
+            conn.close()
+
+# Statement-level triggers NOTIFYing the dashboard: table, trigger name, events
+# and the transition tables the changed rows are read from
+DASHBOARD_TRIGGERS = [
+    ('singers', 'dashboard_notify', 'INSERT OR UPDATE OR DELETE OR TRUNCATE', ''),
+    ('genre_aliases', 'dashboard_notify', 'INSERT OR UPDATE OR DELETE OR TRUNCATE', ''),
+    *[
+        trigger
+        for table in ('project_observations', 'project_singer_association', 'project_files', 'files')
+        for trigger in [
+            (table, 'dashboard_notify_insert', 'INSERT', 'REFERENCING NEW TABLE AS new_rows'),
+            (table, 'dashboard_notify_update', 'UPDATE', 'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+            (table, 'dashboard_notify_delete', 'DELETE', 'REFERENCING OLD TABLE AS old_rows'),
+            (table, 'dashboard_notify_truncate', 'TRUNCATE', ''),
+        ]
+    ],
+]
+
+def install_change_triggers():
+    # NOTIFY the dashboard channel with the table and the project days a
+    # statement touches, once per statement so bulk loads stay cheap. Errors
+    # never fail the writer: they ask for a full refresh instead. CREATE
+    # TRIGGER locks the hot tables: boots only create what is missing, and
+    # recreate everything when the definitions change.
+    function_sql = f"""
+        CREATE OR REPLACE FUNCTION dashboard_notify() RETURNS trigger AS $$
+        DECLARE
+            changed text := CASE TG_OP
+                WHEN 'INSERT' THEN 'SELECT * FROM new_rows'
+                WHEN 'DELETE' THEN 'SELECT * FROM old_rows'
+                ELSE 'SELECT * FROM new_rows UNION ALL SELECT * FROM old_rows'
+            END;
+            days date[];
+        BEGIN
+            -- Singer and alias changes only need the table name, a truncate
+            -- (null days) asks for a full refresh
+            IF TG_TABLE_NAME NOT IN ('singers', 'genre_aliases') AND TG_OP <> 'TRUNCATE' THEN
+                EXECUTE format(CASE TG_TABLE_NAME
+                    WHEN 'project_observations' THEN
+                        'SELECT array_agg(DISTINCT created_at::date) FROM (%s) AS changed'
+                    WHEN 'project_singer_association' THEN
+                        'SELECT array_agg(DISTINCT po.created_at::date) FROM project_observations po
+                         WHERE po.id IN (SELECT project_observation_id FROM (%s) AS changed)'
+                    WHEN 'project_files' THEN
+                        'SELECT array_agg(DISTINCT po.created_at::date) FROM project_observations po
+                         WHERE po.id IN (SELECT project_id FROM (%s) AS changed)'
+                    WHEN 'files' THEN
+                        'SELECT array_agg(DISTINCT po.created_at::date) FROM project_files pf
+                         JOIN project_observations po ON po.id = pf.project_id
+                         WHERE pf.file_id IN (SELECT id FROM (%s) AS changed)'
+                END, changed) INTO days;
+                -- Too many days to fit the payload: null asks for a full refresh
+                days := CASE WHEN cardinality(days) > 100 THEN NULL ELSE COALESCE(days, '{{}}') END;
+            END IF;
+            PERFORM pg_notify('{DASHBOARD_CHANNEL}', json_build_object('table', TG_TABLE_NAME, 'days', days)::text);
+            RETURN NULL;
+        EXCEPTION WHEN OTHERS THEN
+            RAISE WARNING 'dashboard_notify on %: %', TG_TABLE_NAME, SQLERRM;
+            PERFORM pg_notify('{DASHBOARD_CHANNEL}', json_build_object('table', TG_TABLE_NAME, 'days', NULL)::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """
+    version = hashlib.md5((function_sql + repr(DASHBOARD_TRIGGERS)).encode()).hexdigest()
+    tables = sorted({table for table, _, _, _ in DASHBOARD_TRIGGERS})
+    with transaction() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = %s", (ROLLUP_TIMEOUT_MS,))
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('dashboard_schema'))")
+            cursor.execute("SELECT obj_description(to_regprocedure('dashboard_notify()'), 'pg_proc')")
+            if cursor.fetchone()[0] == version:
+                cursor.execute("""
+                    SELECT table_name, trigger_name
+                    FROM unnest(%s::text[], %s::text[]) AS wanted(table_name, trigger_name)
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM pg_trigger
+                        WHERE tgname = trigger_name
+                          AND tgrelid = to_regclass(table_name)
+                          AND tgfoid = to_regprocedure('dashboard_notify()')
+                    )
+                """, ([table for table, _, _, _ in DASHBOARD_TRIGGERS], [name for _, name, _, _ in DASHBOARD_TRIGGERS]))
+                missing = set(cursor.fetchall())
+            else:
+                cursor.execute(function_sql)
+                cursor.execute(f"COMMENT ON FUNCTION dashboard_notify() IS '{version}'")
+                # Drop the triggers of previous definitions
+                cursor.execute("""
+                    SELECT tgrelid::regclass::text, tgname
+                    FROM pg_trigger
+                    WHERE tgrelid = ANY(ARRAY(SELECT to_regclass(name) FROM unnest(%s::text[]) AS name))
+                      AND tgname LIKE 'dashboard\\_notify%%'
+                """, (tables,))
+                for table, name in cursor.fetchall():
+                    cursor.execute(f"DROP TRIGGER {name} ON {table}")
+                missing = {(table, name) for table, name, _, _ in DASHBOARD_TRIGGERS}
+            for table, name, events, referencing in DASHBOARD_TRIGGERS:
+                if (table, name) in missing:
+                    cursor.execute(f"""
+                        DROP TRIGGER IF EXISTS {name} ON {table};
+                        CREATE TRIGGER {name} AFTER {events} ON {table} {referencing}
+                            FOR EACH STATEMENT EXECUTE FUNCTION dashboard_notify();
+                    """)
+
+def refresh_rollup(full=False, days=None):
+    # Recompute the given days (None for undated projects), by default the
+    # last few days only; `full` rebuilds the whole history
+    with transaction() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = %s", (ROLLUP_TIMEOUT_MS,))
+            # Serialize refreshes across workers
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('project_daily_rollup'))")
+            params = {'since': None, 'days': sorted(day for day in days or [] if day), 'undated': None in (days or [])}
+            if days is not None:
+                scope = "po.created_at::date = ANY(%(days)s::date[]) OR (%(undated)s AND po.created_at IS NULL)"
+                cursor.execute(
+                    "DELETE FROM project_daily_rollup WHERE day = ANY(%(days)s::date[]) OR (%(undated)s AND day IS NULL)",
+                    params
+                )
+            else:
+                scope = "%(since)s::date IS NULL OR po.created_at >= %(since)s::date"
+                if not full:
+                    cursor.execute("SELECT max(day) - %s FROM project_daily_rollup", (ROLLUP_LOOKBACK_DAYS,))
+                    params['since'] = cursor.fetchone()[0]
+                if params['since'] is None:
+                    cursor.execute("DELETE FROM project_daily_rollup")
+                else:
+                    cursor.execute("DELETE FROM project_daily_rollup WHERE day >= %(since)s", params)
+            cursor.execute(f"""
+                INSERT INTO project_daily_rollup
+                WITH joined AS (
+                    SELECT
+                        po.created_at::date AS day,
+                        po.language,
+                        po.song_type,
+                        po.style,
+                        {GENRE_SQL} AS genre,
+                        -- File dimensions only count for projects with a singer
+                        CASE WHEN s.id IS NOT NULL THEN f.file_category END AS file_category,
+                        CASE WHEN s.id IS NOT NULL THEN f.file_type END AS file_type,
+                        CASE WHEN s.id IS NOT NULL THEN lower(regexp_replace(f.filename, '^.*\\.', '')) END AS extension,
+                        s.id IS NOT NULL AND f.id IS NOT NULL AS is_joined,
+                        row_number() OVER (
+                            PARTITION BY po.id
+                            ORDER BY s.id IS NOT NULL AND f.id IS NOT NULL DESC, f.id
+                        ) AS project_row,
+                        row_number() OVER (
+                            PARTITION BY po.id, CASE WHEN s.id IS NOT NULL THEN f.file_category END
+                            ORDER BY s.id IS NOT NULL AND f.id IS NOT NULL DESC, f.id
+                        ) AS category_row
+                    FROM project_observations po
+                    LEFT JOIN project_singer_association psa ON psa.project_observation_id = po.id
+                    LEFT JOIN singers s ON psa.singer_id = s.id
+                    LEFT JOIN project_files pf on pf.project_id=po.id
+                    LEFT JOIN files f ON f.id=pf.file_id
+                    WHERE {scope}
+                )
+                SELECT
+                    day, language, song_type, style, genre, file_category, file_type, extension,
+                    count(*) FILTER (WHERE is_joined) AS row_count,
+                    count(*) FILTER (WHERE project_row = 1) AS project_count,
+                    count(*) FILTER (WHERE category_row = 1) AS category_project_count
+                FROM joined
+                GROUP BY day, language, song_type, style, genre, file_category, file_type, extension
+            """, params)
+            sync_genre_canonical(cursor)
+
+def sync_genre_canonical(cursor):
+    # Canonicalize the raw genres genre_canonical has not seen yet
+    cursor.execute("""
+        SELECT DISTINCT r.genre
+        FROM project_daily_rollup r
+        WHERE r.genre IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM genre_canonical gc WHERE gc.raw_genre = r.genre)
     """)
-    df = df[df["name"] != "scraper"].drop(columns=["name"])
-    df = df["gender"].value_counts().reset_index()
+    raw_genres = [genre for genre, in cursor.fetchall()]
+    if raw_genres:
+        cursor.execute("""
+            INSERT INTO genre_canonical (raw_genre, preprocessed)
+            SELECT * FROM unnest(%s::text[], %s::text[])
+            ON CONFLICT (raw_genre) DO NOTHING
+        """, (raw_genres, [genres_preprocessing(genre) for genre in raw_genres]))
+
+def fetch_rollup():
+    # Read from the primary, which was just refreshed, with canonical genres
+    dimensions = ', '.join('gm.genre' if dimension == 'genre' else f'r.{dimension}' for dimension in ROLLUP_DIMENSIONS)
+    return fetch_data(f"""
+        SELECT r.day, {dimensions}, {', '.join('r.' + measure for measure in ROLLUP_MEASURES)}
+        FROM project_daily_rollup r
+        LEFT JOIN genre_mapping gm ON gm.raw_genre = r.genre
+    """, replica=False, schema=ROLLUP_SCHEMA)
+
+class OlapCube:
+    # Sparse count cube: each dimension is encoded as small integer codes
+    # (-1 for missing values) and every panel is a masked `np.bincount`.
+
+    def __init__(self, frame, dimensions, measures):
+        self.dimensions = list(dimensions)
+        self.labels = {}
+        codes = []
+        for dimension in self.dimensions:
+            column = frame[dimension]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                # Categorical columns are already encoded with sorted categories
+                column = column.cat.remove_unused_categories()
+                dimension_codes, labels = column.cat.codes.to_numpy(), pd.Index(column.cat.categories)
+            else:
+                dimension_codes, labels = pd.factorize(column, sort=True)
+            codes.append(dimension_codes)
+            self.labels[dimension] = labels
+        self.codes = np.column_stack(codes).astype(np.int32)
+        self.measures = {measure: frame[measure].to_numpy(dtype=np.int64) for measure in measures}
+
+    def digest(self):
+        # Content hash, independent of the row order, so every worker holding
+        # the same data reports the same version
+        if getattr(self, '_digest', None) is None:
+            columns = [self.codes[:, index] for index in range(len(self.dimensions))]
+            columns += [self.measures[measure] for measure in sorted(self.measures)]
+            order = np.lexsort(columns[::-1]) if len(self.codes) else np.arange(0)
+            content = hashlib.blake2b(digest_size=16)
+            for dimension in self.dimensions:
+                content.update('\x00'.join(map(str, self.labels[dimension])).encode())
+            for column in columns:
+                content.update(np.ascontiguousarray(column[order], dtype=np.int64).tobytes())
+            self._digest = content.hexdigest()
+        return self._digest
+
+    def _mask(self, where):
+        mask = np.ones(len(self.codes), dtype=bool)
+        for dimension, selection in (where or {}).items():
+            column = self.codes[:, self.dimensions.index(dimension)]
+            labels = self.labels[dimension]
+            if isinstance(selection, tuple):
+                # (start, end) range, both ends inclusive and optional
+                start, end = selection
+                if start is not None:
+                    mask &= column >= labels.searchsorted(pd.Timestamp(start), side='left')
+                if end is not None:
+                    mask &= (column >= 0) & (column < labels.searchsorted(pd.Timestamp(end), side='right'))
+            elif selection is not None:
+                values = selection if isinstance(selection, list) else [selection]
+                codes = labels.get_indexer(values)
+                mask &= np.isin(column, codes[codes >= 0])
+        return mask
+
+    def sum(self, by, measure, where=None):
+        # Totals of `measure` grouped by one dimension (Series) or two (DataFrame)
+        by = [by] if isinstance(by, str) else list(by)
+        mask = self._mask(where)
+        columns = [self.codes[:, self.dimensions.index(dimension)] for dimension in by]
+        for column in columns:
+            mask &= column >= 0
+        sizes = [len(self.labels[dimension]) for dimension in by]
+        flat = np.ravel_multi_index([column[mask] for column in columns], sizes)
+        totals = np.bincount(flat, weights=self.measures[measure][mask], minlength=int(np.prod(sizes))).astype(np.int64)
+        if len(by) == 1:
+            return pd.Series(totals, index=pd.Index(self.labels[by[0]], name=by[0]), name=measure)
+        return pd.DataFrame(
+            totals.reshape(sizes),
+            index=pd.Index(self.labels[by[0]], name=by[0]),
+            columns=pd.Index(self.labels[by[1]], name=by[1]),
+        )
+
+def build_project_cube():
+    rollup = fetch_rollup()
+    return OlapCube(rollup, ['day'] + ROLLUP_DIMENSIONS, ROLLUP_MEASURES)
+
+def build_singer_cube():
+    singers = fetch_data("""
+        SELECT gender, count(*) AS count
+        FROM singers
+        WHERE name IS DISTINCT FROM 'scraper'
+        GROUP BY gender
+    """, schema={'gender': 'category', 'count': 'int32'})
+    return OlapCube(singers, ['gender'], ['count'])
+
+# Changes announced on the dashboard channel and not applied to the cubes yet:
+# rollup days to recompute, `all` after a full invalidation, `singers` for the
+# gender panel, `genres` after an alias edit
+_changes_lock = threading.Lock()
+_pending_changes = {'days': set(), 'all': False, 'singers': False, 'genres': False}
+_listening = threading.Event()
+_listener_pid = None
+_triggers_installed = False
+
+def record_change(payload):
+    with _changes_lock:
+        if payload['table'] == 'singers':
+            _pending_changes['singers'] = True
+        elif payload['table'] == 'genre_aliases':
+            _pending_changes['genres'] = True
+        elif payload['days'] is None:
+            _pending_changes['all'] = True
+        else:
+            _pending_changes['days'].update(payload['days'])
+
+def take_pending_changes():
+    global _pending_changes
+    with _changes_lock:
+        changes = _pending_changes
+        _pending_changes = {'days': set(), 'all': False, 'singers': False, 'genres': False}
+    return changes
+
+def listen_for_changes():
+    while True:
+        conn = None
+        try:
+            conn = connect()
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {DASHBOARD_CHANNEL}")
+            # Writes may have been missed while disconnected
+            with _changes_lock:
+                _pending_changes['all'] = True
+                _pending_changes['singers'] = True
+            _listening.set()
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    record_change(json.loads(conn.notifies.pop(0).payload))
+        except Exception:
+            logger.exception("Dashboard change listener failed, retrying")
+            _listening.clear()
+            time.sleep(5)
+        finally:
+            if conn is not None:
+                conn.close()
+
+def ensure_change_listener():
+    # One listener thread per worker process, started after the fork
+    global _listener_pid
+    if not (DASHBOARD_LISTEN and _triggers_installed) or _listener_pid == os.getpid():
+        return
+    _listener_pid = os.getpid()
+    _listening.clear()
+    threading.Thread(target=listen_for_changes, name='dashboard-listener', daemon=True).start()
+    _listening.wait(5)
+
+_cubes_lock = threading.Lock()
+_cubes = None
+_cubes_built_at = None
+# Set once the database is prepared and the cubes are fresh; until then a
+# cold-started worker serves its snapshot
+_warm = threading.Event()
+_warm_pid = None
+_snapshot_first_singer = None
+
+def restore_pending_changes(changes):
+    with _changes_lock:
+        _pending_changes['days'].update(changes['days'])
+        _pending_changes['all'] |= changes['all']
+        _pending_changes['singers'] |= changes['singers']
+        _pending_changes['genres'] |= changes['genres']
+
+_refresh_retry_at = 0.0
+
+def get_cubes():
+    # Apply pending changes while listening, otherwise fully refresh the rollup
+    # (edits to old projects only show up this way) and rebuild the cubes at
+    # most once per interval. Stale cubes keep being
+    # served while the database is unavailable, or while another thread is
+    # refreshing them, and refreshes back off for CIRCUIT_COOLDOWN_SECONDS
+    # after a failure.
+    global _cubes, _cubes_built_at, _refresh_retry_at
+    ensure_warm_start()
+    if not _warm.is_set():
+        if _cubes is not None:
+            return _cubes
+        _warm.wait()
+    ensure_change_listener()
+    with stage('cube'):
+        if not _cubes_lock.acquire(blocking=_cubes is None):
+            return _cubes
+        try:
+            if time.monotonic() < _refresh_retry_at:
+                if _cubes is None:
+                    raise DatabaseUnavailable("Dashboard refresh backing off")
+                return _cubes
+            changes = take_pending_changes()
+            cubes = _cubes
+            try:
+                prepare_database()
+                if _cubes is None or (not _listening.is_set() and time.monotonic() - _cubes_built_at >= ROLLUP_REFRESH_SECONDS):
+                    refresh_rollup(full=not _listening.is_set())
+                    _cubes = (build_project_cube(), build_singer_cube())
+                    _cubes_built_at = time.monotonic()
+                elif _listening.is_set():
+                    project_cube, singer_cube = _cubes
+                    if changes['all']:
+                        refresh_rollup(full=True)
+                        project_cube = build_project_cube()
+                    elif changes['days']:
+                        refresh_rollup(days=changes['days'])
+                        project_cube = build_project_cube()
+                    elif changes['genres']:
+                        project_cube = build_project_cube()
+                    if changes['singers']:
+                        singer_cube = build_singer_cube()
+                    _cubes = (project_cube, singer_cube)
+            except (psycopg2.Error, DatabaseUnavailable):
+                restore_pending_changes(changes)
+                _refresh_retry_at = time.monotonic() + CIRCUIT_COOLDOWN_SECONDS
+                if _cubes is None:
+                    raise
+                logger.warning("Could not refresh the dashboard cubes, serving stale data", exc_info=True)
+            if _cubes is not cubes:
+                save_snapshot(_cubes)
+            return _cubes
+        finally:
+            _cubes_lock.release()
+
+def save_snapshot(cubes):
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(DASHBOARD_SNAPSHOT)), mode=0o700, exist_ok=True)
+        temporary = f"{DASHBOARD_SNAPSHOT}.{os.getpid()}"
+        with os.fdopen(os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as snapshot:
+            pickle.dump({'cubes': cubes, 'first_singer': _snapshot_first_singer}, snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, DASHBOARD_SNAPSHOT)
+    except (OSError, pickle.PicklingError):
+        logger.warning("Could not save the dashboard snapshot", exc_info=True)
+
+def load_snapshot():
+    # Unpickling runs code: only trust a snapshot this user wrote and nobody
+    # else can modify
+    global _cubes, _cubes_built_at, _snapshot_first_singer
+    try:
+        with open(DASHBOARD_SNAPSHOT, 'rb') as snapshot:
+            status = os.fstat(snapshot.fileno())
+            if status.st_uid != os.getuid() or status.st_mode & 0o022:
+                logger.warning("Ignoring dashboard snapshot %s, not owned by this user or writable by others", DASHBOARD_SNAPSHOT)
+                return
+            saved = pickle.load(snapshot)
+    except FileNotFoundError:
+        return
+    except Exception:
+        logger.warning("Ignoring unreadable dashboard snapshot", exc_info=True)
+        return
+    if sorted(saved['cubes'][0].measures) != sorted(ROLLUP_MEASURES):
+        logger.warning("Ignoring dashboard snapshot from another rollup version")
+        return
+    _cubes = saved['cubes']
+    _cubes_built_at = time.monotonic()
+    _snapshot_first_singer = saved['first_singer']
+
+def warm_start():
+    # Prepare the database, then swap the snapshot cubes for fresh ones
+    global _cubes, _cubes_built_at
+    try:
+        prepare_database()
+        ensure_change_listener()
+        take_pending_changes()
+        with _cubes_lock:
+            refresh_rollup(full=not _listening.is_set())
+            _cubes = (build_project_cube(), build_singer_cube())
+            _cubes_built_at = time.monotonic()
+            first_singer()
+            save_snapshot(_cubes)
+    except (psycopg2.Error, DatabaseUnavailable):
+        logger.warning("Cold start refresh failed, serving the snapshot until the next request", exc_info=True)
+    finally:
+        _warm.set()
+
+def ensure_warm_start():
+    # One warm-up per worker process, started after the fork
+    global _warm_pid
+    if _warm_pid == os.getpid():
+        return
+    _warm_pid = os.getpid()
+    if _warm.is_set():
+        return
+    threading.Thread(target=warm_start, name='dashboard-warm-start', daemon=True).start()
+
+def project_measure(where):
+    # A project with files in several categories belongs to each of them
+    return 'category_project_count' if (where or {}).get('file_category') is not None else 'project_count'
+
+def singer_gender_figure(singer_cube):
+    df = singer_cube.sum("gender", "count")
+    df = df[df > 0].sort_values(ascending=False).reset_index()
     df.columns = ['gender', 'count']
 
     fig = go.Figure(
@@ -79,14 +1156,40 @@ def singer_gender_graph():
         ]
     )
 
+    return fig
+
+def singer_gender_graph(singer_cube):
     return dbc.Card([
         dbc.CardHeader(html.H2("Proportion de male et female"), className="text-center"),
         dbc.CardBody(
-            [dcc.Graph(figure=fig, config={'responsive': True})],
+            [dcc.Graph(id='singer-gender-graph', figure=singer_gender_figure(singer_cube), config={'responsive': True})],
             className="d-flex justify-content-center align-items-center"
         )
     ], className="mt-2 mb-2")
 
+def top_n_ranks(totals, n):
+    # Positions of the `n` largest totals, in their original order
+    return np.sort(np.argsort(-totals.to_numpy(), kind='stable')[:n])
+
+def top_n_with_other(counts, n):
+    # Keeps the `n` largest entries (Series values or DataFrame row sums) and
+    # sums the long tail into an OTHER_LABEL entry
+    if len(counts) <= n:
+        return counts
+    totals = counts if isinstance(counts, pd.Series) else counts.sum(axis=1)
+    keep = np.zeros(len(counts), dtype=bool)
+    keep[top_n_ranks(totals, n)] = True
+    other = counts[~keep].sum()
+    if isinstance(counts, pd.Series):
+        return pd.concat([counts[keep], pd.Series([other], index=[OTHER_LABEL])])
+    return pd.concat([counts[keep], other.to_frame(OTHER_LABEL).T])
+
+def top_n_labels(cube, dimension, n, where=None):
+    # The values kept by top_n_with_other on a `row_count` panel
+    counts = cube.sum(dimension, "row_count", where)
+    counts = counts[counts > 0]
+    return counts.index[top_n_ranks(counts, n)].tolist() if len(counts) > n else counts.index.tolist()
+
 def genres_preprocessing(genre):
     # return unidecode(
     #     str(genre.replace(";", ",").replace("/", ",").replace("-", " ")
@@ -95,23 +1198,9 @@ def genres_preprocessing(genre):
     first_genre = re.sub(r'\s+', ' ', genre.replace(";", ",").replace("/", ",").replace("-", " ").lower().replace("rnb", "r&b")).strip().split(",")[0]
     return unidecode(first_genre)
 
-def normalize_row(row):
-    if '|' in row['genres']:
-        genres = [g.strip() for g in row['genres'].split('|')]
-        if row['file_category'] == 'DELIVERABLE':
-            return pd.Series([genres[0], row['project_id'], 'DELIVERABLE'])
-        elif row['file_category'] == 'REFERENCES':
-            return pd.Series([genres[1], row['project_id'], 'REFERENCES'])
-    else:
-        return pd.Series([row['genres'], row['project_id'], row['file_category']])
-    
-
-def singer_project_style():
-    df = fetch_data("""
-        SELECT style
-        FROM project_observations
-    """)
-    df = df["style"].value_counts().reset_index()
+def singer_project_style_figure(cube, where=None):
+    df = cube.sum("style", project_measure(where), where)
+    df = df[df > 0].sort_values(ascending=False).reset_index()
     df.columns = ['style', 'count']
 
     fig = go.Figure(
@@ -143,21 +1232,21 @@ def singer_project_style():
         ]
     )
 
+    return fig
+
+def singer_project_style(cube):
     return dbc.Card([
         dbc.CardHeader(html.H2("Proportion des styles de projets"), className="text-center"),
         dbc.CardBody(
-            [dcc.Graph(figure=fig, config={'responsive': True})],
+            [dcc.Graph(id='project-style-graph', figure=singer_project_style_figure(cube), config={'responsive': True})],
             className="d-flex justify-content-center align-items-center"
         )
     ], className="mt-2 mb-2")
 
-def project_per_language():
-    df = fetch_data("""
-        SELECT language
-        FROM project_observations
-    """)
+def project_per_language_figure(cube, where=None):
     # Compute project counts by language
-    df = df["language"].value_counts().reset_index()
+    df = cube.sum("language", project_measure(where), where)
+    df = df[df > 0].sort_values(ascending=False).reset_index()
     df.columns = ['lang', 'count']
 
     # Create the bar chart using Graph Objects
@@ -199,21 +1288,21 @@ def project_per_language():
         ]
     )
 
+    return fig
+
+def project_per_language(cube):
     return dbc.Card([
         dbc.CardHeader(html.H2("Proportion des projets par langue"), className="text-center"),
         dbc.CardBody(
-            [dcc.Graph(figure=fig, config={'responsive': True})],
+            [dcc.Graph(id='project-language-graph', figure=project_per_language_figure(cube), config={'responsive': True})],
             className="d-flex justify-content-center align-items-center"
         )
     ], className="mt-2 mb-2")
 
-def project_per_song_type():
-    df = fetch_data("""
-        SELECT song_type
-        FROM project_observations
-    """)
+def project_per_song_type_figure(cube, where=None):
     # Compute project counts by song_type
-    df = df["song_type"].value_counts().reset_index()
+    df = cube.sum("song_type", project_measure(where), where)
+    df = df[df > 0].sort_values(ascending=False).reset_index()
     df.columns = ['type', 'count']
 
     # Create the bar chart using Graph Objects
@@ -254,30 +1343,20 @@ def project_per_song_type():
         ]
     )
 
+    return fig
+
+def project_per_song_type(cube):
     return dbc.Card([
         dbc.CardHeader(html.H2("Proportion des projets par type de chants"), className="text-center"),
         dbc.CardBody(
-            [dcc.Graph(figure=fig, config={'responsive': True})],
+            [dcc.Graph(id='project-song-type-graph', figure=project_per_song_type_figure(cube), config={'responsive': True})],
             className="d-flex justify-content-center align-items-center"
         )
     ], className="mt-2 mb-2")
 
-def project_genres_graph():
-    df = fetch_data("""
-        SELECT po.id AS project_id, po.genres, f.file_category
-        FROM project_observations po
-        JOIN project_singer_association psa ON psa.project_observation_id = po.id
-        JOIN singers s ON psa.singer_id = s.id
-        JOIN project_files pf on pf.project_id=po.id
-        JOIN files f ON f.id=pf.file_id
-        ORDER BY po.created_at DESC
-    """)
-    df = df.dropna(subset=["genres"], ignore_index=True)
-    df = df.apply(normalize_row, axis=1)
-    df.columns = ['genres', 'project_id', 'file_category']
-    df.genres = df.genres.values
-    df = df.dropna(subset=["genres"], ignore_index=True)
-    df = df["genres"].apply(genres_preprocessing).value_counts().reset_index()
+def project_genres_graph_figure(cube, where=None):
+    df = cube.sum("genre", "row_count", where)
+    df = top_n_with_other(df[df > 0], GENRE_TOP_N).sort_values(ascending=False).reset_index()
     df.columns = ['genres', 'count']
 
     fig = go.Figure(go.Treemap(
@@ -297,27 +1376,21 @@ def project_genres_graph():
         margin=dict(t=0, l=0, r=0, b=0)
     )
 
+    return fig
+
+def project_genres_graph(cube):
     return dbc.Card([
         dbc.CardHeader(html.H2("Genres musicaux"), className="text-center"),
         dbc.CardBody(
-            [dcc.Graph(figure=fig, config={'responsive': True})],
+            [dcc.Graph(id='project-genres-graph', figure=project_genres_graph_figure(cube), config={'responsive': True})],
             className="d-flex justify-content-center align-items-center"
         )
     ], className="mt-2 mb-2")
 
-def project_file_category():
-    df = fetch_data("""
-        SELECT po.title, f.file_category
-        FROM project_observations po
-        JOIN project_singer_association psa ON psa.project_observation_id = po.id
-        JOIN singers s ON psa.singer_id = s.id
-        JOIN project_files pf on pf.project_id=po.id
-        JOIN files f ON f.id=pf.file_id
-        ORDER BY po.created_at DESC
-    """)
+def project_file_category_figure(cube, where=None):
     # Compute project counts by file_category
-    df = df.drop_duplicates(subset=["title"]).reset_index(drop=True)
-    df = df.groupby(["file_category"])["title"].count().reset_index()
+    df = cube.sum("file_category", project_measure(where), where)
+    df = df[df > 0].reset_index()
     df.columns = ["category", "count"]
 
     # Create the bar chart using Graph Objects
@@ -358,27 +1431,21 @@ def project_file_category():
         ]
     )
 
+    return fig
+
+def project_file_category(cube):
     return dbc.Card([
         dbc.CardHeader(html.H2("Proportion des projets à titre unique par categories"), className="text-center"),
         dbc.CardBody(
-            [dcc.Graph(figure=fig, config={'responsive': True})],
+            [dcc.Graph(id='project-file-category-graph', figure=project_file_category_figure(cube), config={'responsive': True})],
             className="d-flex justify-content-center align-items-center"
         )
     ], className="mt-2 mb-2")
 
-def project_file_type():
-    df = fetch_data("""
-        SELECT po.title, f.file_type
-        FROM project_observations po
-        JOIN project_singer_association psa ON psa.project_observation_id = po.id
-        JOIN singers s ON psa.singer_id = s.id
-        JOIN project_files pf on pf.project_id=po.id
-        JOIN files f ON f.id=pf.file_id
-        ORDER BY po.created_at DESC
-    """)
+def project_file_type_figure(cube, where=None):
     # Compute project counts by file_type
-    df = df.drop_duplicates(subset=["title"]).reset_index(drop=True)
-    df = df.groupby(["file_type"])["title"].count().reset_index()
+    df = cube.sum("file_type", project_measure(where), where)
+    df = df[df > 0].reset_index()
     df.columns = ["type", "count"]
 
     # Create the bar chart using Graph Objects
@@ -419,27 +1486,21 @@ def project_file_type():
         ]
     )
 
+    return fig
+
+def project_file_type(cube):
     return dbc.Card([
         dbc.CardHeader(html.H2("Proportion des projets à titre unique par type"), className="text-center"),
         dbc.CardBody(
-            [dcc.Graph(figure=fig, config={'responsive': True})],
+            [dcc.Graph(id='project-file-type-graph', figure=project_file_type_figure(cube), config={'responsive': True})],
             className="d-flex justify-content-center align-items-center"
         )
     ], className="mt-2 mb-2")
 
-def project_file_type_extension():
-    df = fetch_data("""
-        SELECT f.filename
-        FROM project_observations po
-        JOIN project_singer_association psa ON psa.project_observation_id = po.id
-        JOIN singers s ON psa.singer_id = s.id
-        JOIN project_files pf on pf.project_id=po.id
-        JOIN files f ON f.id=pf.file_id
-        ORDER BY po.created_at DESC
-    """)
+def project_file_type_extension_figure(cube, where=None):
     # Compute project counts by file_type extension
-    df["filename_ext"] = df["filename"].apply(lambda x : x.split(".")[-1].lower())
-    df = df.groupby(["filename_ext"])["filename"].count().reset_index()
+    df = cube.sum("extension", "row_count", where)
+    df = top_n_with_other(df[df > 0], EXTENSION_TOP_N).reset_index()
     df.columns = ["extension", "count"]
 
     # Create the bar chart using Graph Objects
@@ -480,35 +1541,20 @@ def project_file_type_extension():
         ]
     )
 
+    return fig
+
+def project_file_type_extension(cube):
     return dbc.Card([
         dbc.CardHeader(html.H2("Poportion des fichiers"), className="text-center"),
         dbc.CardBody(
-            [dcc.Graph(figure=fig, config={'responsive': True})],
+            [dcc.Graph(id='project-extension-graph', figure=project_file_type_extension_figure(cube), config={'responsive': True})],
             className="d-flex justify-content-center align-items-center"
         )
     ], className="mt-2 mb-2")
 
-def project_file_type_extension_per_file_category():
-    df = fetch_data("""
-        SELECT po.title, f.filename, f.file_category
-        FROM project_observations po
-        JOIN project_singer_association psa ON psa.project_observation_id = po.id
-        JOIN singers s ON psa.singer_id = s.id
-        JOIN project_files pf on pf.project_id=po.id
-        JOIN files f ON f.id=pf.file_id
-        ORDER BY po.created_at DESC
-    """)
-    
-    # Extraire l'extension
-    df["filename_ext"] = df["filename"].apply(lambda x: x.split(".")[-1].lower())
-    
-    df = df.pivot_table(
-        index='filename_ext',
-        columns='file_category',
-        values='title',
-        aggfunc='count',
-        fill_value=0
-    )
+def project_file_type_extension_per_file_category_figure(cube, where=None):
+    df = cube.sum(["extension", "file_category"], "row_count", where)
+    df = top_n_with_other(df.loc[df.sum(axis=1) > 0, df.sum(axis=0) > 0], EXTENSION_TOP_N)
 
     # Création de la heatmap avec go.Heatmap
     fig = go.Figure(data=go.Heatmap(
@@ -543,122 +1589,845 @@ def project_file_type_extension_per_file_category():
         ]
     )
 
+    return fig
+
+def project_file_type_extension_per_file_category(cube):
     return dbc.Card([
         dbc.CardHeader(html.H2("Proportion des fichiers par extension et catégorie"), className="text-center"),
         dbc.CardBody(
-            [dcc.Graph(figure=fig, config={'responsive': True})],
+            [dcc.Graph(id='project-extension-category-graph', figure=project_file_type_extension_per_file_category_figure(cube), config={'responsive': True})],
             className="d-flex justify-content-center align-items-center"
         )
     ], className="mt-2 mb-2")
 
-singers = fetch_data("""
-    SELECT name
-    FROM singers
-    WHERE name <> 'scraper'
-""")["name"]
-
-app.layout = dbc.Container(
-    [
-        on_off_head,
-        dbc.Row([
-            dbc.Col(singer_gender_graph()),
-            dbc.Col(singer_project_style()),
-        ]),
-        dbc.Row([
-            dbc.Col(project_per_language()),
-            dbc.Col(project_per_song_type()),
-        ]),
-        dbc.Row([
-            dbc.Col(project_genres_graph()),
-            dbc.Col(
-                dbc.Card([
-                    dbc.CardHeader([
-                        html.H2("Projets par langue pour le chanteur", className="text-center"),
-                    ]),
-                    dbc.CardBody([
-                        dbc.Row([
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search_singers(prefix, limit=SINGER_SEARCH_LIMIT, cancel_key=None):
+    # Case-insensitive prefix match served by singers_name_prefix_idx
+    pattern = escape_like(prefix.lower()) + '%'
+    return fetch_data("""
+        SELECT name
+        FROM singers
+        WHERE lower(name) LIKE %s AND name <> 'scraper'
+        ORDER BY lower(name)
+        LIMIT %s
+    """, (pattern, limit), timeout_ms=SEARCH_TIMEOUT_MS, cancel_key=cancel_key)["name"].tolist()
+
+def first_singer():
+    # Also kept for the snapshot served by cold-started workers
+    global _snapshot_first_singer
+    df = fetch_prepared('first_singer')
+    _snapshot_first_singer = df["name"].iloc[0] if len(df) else None
+    return _snapshot_first_singer
+
+# Last figure served per callback arguments, replayed when the database is unavailable
+LAST_FIGURES_MAX = 256
+_last_figures = {}
+
+def remember_figure(key, fig):
+    _last_figures.pop(key, None)
+    _last_figures[key] = fig
+    if len(_last_figures) > LAST_FIGURES_MAX:
+        _last_figures.pop(next(iter(_last_figures)))
+
+def degraded_card():
+    return dbc.Alert("Données temporairement indisponibles", color="warning", className="mt-2 mb-2")
+
+# Project panels refreshed by the date range and cross-filters: graph id,
+# figure builder and the dimension a click on that panel filters by
+PROJECT_PANELS = [
+    ('project-style-graph', singer_project_style_figure, 'style'),
+    ('project-language-graph', project_per_language_figure, 'language'),
+    ('project-song-type-graph', project_per_song_type_figure, None),
+    ('project-genres-graph', project_genres_graph_figure, None),
+    ('project-file-category-graph', project_file_category_figure, 'file_category'),
+    ('project-file-type-graph', project_file_type_figure, None),
+    ('project-extension-graph', project_file_type_extension_figure, None),
+    ('project-extension-category-graph', project_file_type_extension_per_file_category_figure, None),
+]
+CROSS_FILTER_GRAPHS = {graph_id: dimension for graph_id, _, dimension in PROJECT_PANELS if dimension}
+
+# Trace arrays that change with the filters, everything else stays in the browser
+PATCHED_TRACE_KEYS = {
+    'bar': ['x', 'y', 'text', 'marker.color'],
+    'pie': ['labels', 'values'],
+    'treemap': ['labels', 'parents', 'values', 'marker.colors'],
+    'heatmap': ['x', 'y', 'z', 'text'],
+}
+
+def figure_digest(fig):
+    # Hash of what figure_patch sends for a figure
+    trace = fig.data[0]
+    content = [trace[key] for key in PATCHED_TRACE_KEYS[trace.type]]
+    if fig.layout.annotations:
+        content.append(fig.layout.annotations[0].text)
+    return hashlib.blake2b(json.dumps(content, cls=PlotlyJSONEncoder).encode(), digest_size=16).hexdigest()
+
+def figure_patch(fig):
+    patch = Patch()
+    trace = fig.data[0]
+    for key in PATCHED_TRACE_KEYS[trace.type]:
+        *parents, name = key.split('.')
+        target = patch['data'][0]
+        for part in parents:
+            target = target[part]
+        target[name] = trace[key]
+    # The first annotation holds the total
+    if fig.layout.annotations:
+        patch['layout']['annotations'][0]['text'] = fig.layout.annotations[0].text
+    return patch
+
+def panel_figures(project_cube, start_date, end_date, cross_filter):
+    figures = {}
+    for graph_id, figure, own_dimension in PROJECT_PANELS:
+        # A panel is not filtered by its own selection
+        where = {'day': (start_date, end_date)}
+        where.update({
+            dimension: value
+            for dimension, value in (cross_filter or {}).items()
+            if dimension != own_dimension
+        })
+        with stage(f'figure:{graph_id}'):
+            figures[graph_id] = figure(project_cube, where)
+    return figures
+
+# Panels kept current in live mode
+LIVE_PANELS = ['singer-gender-graph'] + [graph_id for graph_id, _, _ in PROJECT_PANELS]
+
+def data_version(project_cube, singer_cube):
+    return f"{project_cube.digest()}-{singer_cube.digest()}"
+
+def live_state(version, context, figures):
+    return {
+        'version': version,
+        'context': list(context),
+        'digests': {graph_id: figure_digest(figures[graph_id]) for graph_id in LIVE_PANELS},
+    }
+
+# Segment clicked on each panel: dimension and the clickData point key holding its value
+DRILLDOWN_GRAPHS = {
+    'singer-gender-graph': [('gender', 'label')],
+    'project-style-graph': [('style', 'label')],
+    'project-language-graph': [('language', 'x')],
+    'project-song-type-graph': [('song_type', 'x')],
+    'project-genres-graph': [('genre', 'label')],
+    'project-file-category-graph': [('file_category', 'x')],
+    'project-file-type-graph': [('file_type', 'x')],
+    'project-extension-graph': [('extension', 'x')],
+    'project-extension-category-graph': [('extension', 'y'), ('file_category', 'x')],
+}
+
+DRILLDOWN_COLUMNS = ['title', 'language', 'song_type', 'style', 'genres', 'created_at']
+
+def drilldown_conditions(filters):
+    # SQL conditions on `po` selecting the projects behind a segment
+    conditions, params = [], []
+    file_conditions, file_params = [], []
+    for dimension, value in filters.items():
+        if dimension == 'day':
+            start_date, end_date = value
+            if start_date:
+                conditions.append("po.created_at >= %s::date")
+                params.append(start_date)
+            if end_date:
+                conditions.append("po.created_at < %s::date + 1")
+                params.append(end_date)
+        elif dimension in ('language', 'song_type', 'style'):
+            conditions.append(f"po.{dimension} = %s")
+            params.append(value)
+        elif dimension == 'gender':
+            conditions.append("""EXISTS (
+                SELECT 1
+                FROM project_singer_association psa
+                JOIN singers s ON psa.singer_id = s.id
+                WHERE psa.project_observation_id = po.id AND s.gender = %s
+            )""")
+            params.append(value)
+        elif dimension in ('file_category', 'file_type'):
+            file_conditions.append(f"f.{dimension} = %s")
+            file_params.append(value)
+        elif dimension == 'extension':
+            # {'exclude': [...]} selects the OTHER_LABEL bucket
+            if isinstance(value, dict):
+                file_conditions.append("lower(regexp_replace(f.filename, '^.*\\.', '')) <> ALL(%s)")
+                file_params.append(value['exclude'])
+            else:
+                file_conditions.append("lower(regexp_replace(f.filename, '^.*\\.', '')) = %s")
+                file_params.append(value)
+        elif dimension == 'genre':
+            if isinstance(value, dict):
+                file_conditions.append(f"{GENRE_SQL} IN (SELECT raw_genre FROM genre_mapping WHERE genre <> ALL(%s))")
+                file_params.append(value['exclude'])
+            else:
+                file_conditions.append(f"{GENRE_SQL} IN (SELECT raw_genre FROM genre_mapping WHERE genre = %s)")
+                file_params.append(value)
+    if file_conditions:
+        # Same singer/file join as the file panels, on a single file
+        conditions.append(f"""EXISTS (
+            SELECT 1
+            FROM project_singer_association psa
+            JOIN singers s ON psa.singer_id = s.id
+            JOIN project_files pf on pf.project_id=po.id
+            JOIN files f ON f.id=pf.file_id
+            WHERE psa.project_observation_id = po.id AND {' AND '.join(file_conditions)}
+        )""")
+        params.extend(file_params)
+    return conditions, params
+
+def fetch_drilldown_rows(filters, start_row, end_row, sort_model=None, filter_model=None, cursor=None):
+    conditions, params = drilldown_conditions(filters)
+    for column, model in (filter_model or {}).items():
+        if column not in DRILLDOWN_COLUMNS or column == 'created_at' or not model.get('filter'):
+            continue
+        pattern = escape_like(str(model['filter']))
+        if model.get('type') == 'startsWith':
+            pattern = pattern + '%'
+        elif model.get('type') != 'equals':
+            pattern = '%' + pattern + '%'
+        conditions.append(f"po.{column} ILIKE %s")
+        params.append(pattern)
+
+    sort = (sort_model or [{'colId': 'created_at', 'sort': 'desc'}])[0]
+    sort_column = sort['colId'] if sort['colId'] in DRILLDOWN_COLUMNS else 'created_at'
+    direction = 'ASC' if sort.get('sort') == 'asc' else 'DESC'
+    offset = start_row
+    if sort_column == 'created_at' and cursor is not None:
+        # Keyset pagination on (created_at, id), NULL dates sort last
+        created_at, project_id = cursor
+        comparison = '>' if direction == 'ASC' else '<'
+        if created_at is None:
+            conditions.append(f"po.created_at IS NULL AND po.id {comparison} %s")
+            params.append(project_id)
+        else:
+            conditions.append(f"((po.created_at, po.id) {comparison} (%s::timestamp, %s) OR po.created_at IS NULL)")
+            params.extend([created_at, project_id])
+        offset = 0
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # One extra row tells whether this is the last block
+    df = fetch_data(f"""
+        SELECT po.id, {', '.join('po.' + column for column in DRILLDOWN_COLUMNS)}
+        FROM project_observations po
+        {where}
+        ORDER BY po.{sort_column} {direction} NULLS LAST, po.id {direction}
+        LIMIT %s OFFSET %s
+    """, params + [end_row - start_row + 1, offset])
+    is_last_block = len(df) <= end_row - start_row
+    df = df.iloc[:end_row - start_row]
+    df["created_at"] = df["created_at"].map(lambda value: value.isoformat() if pd.notna(value) else None)
+    return df, is_last_block
+
+def drilldown_grid():
+    return dag.AgGrid(
+        id='drilldown-grid',
+        rowModelType='infinite',
+        columnDefs=[
+            {'field': 'title', 'headerName': 'Titre'},
+            {'field': 'language', 'headerName': 'Langue'},
+            {'field': 'song_type', 'headerName': 'Type de chant'},
+            {'field': 'style', 'headerName': 'Style'},
+            {'field': 'genres', 'headerName': 'Genres'},
+            {'field': 'created_at', 'headerName': 'Créé le', 'sort': 'desc', 'filter': False},
+        ],
+        defaultColDef={
+            'sortable': True,
+            'filter': 'agTextColumnFilter',
+            'filterParams': {'filterOptions': ['contains', 'equals', 'startsWith'], 'maxNumConditions': 1},
+        },
+        dashGridOptions={
+            'cacheBlockSize': DRILLDOWN_BLOCK_SIZE,
+            'maxConcurrentDatasourceRequests': 1,
+            'infiniteInitialRowCount': 1,
+        },
+        columnSize='sizeToFit',
+    )
+
+_database_lock = threading.Lock()
+_database_ready = False
+_database_retry_at = 0.0
+
+def prepare_database():
+    # Rollup schema, change triggers then indexes, once per process. Failed
+    # triggers are retried every ROLLUP_REFRESH_SECONDS, refreshing meanwhile.
+    global _database_ready, _database_retry_at, _triggers_installed
+    with _database_lock:
+        if _database_ready or time.monotonic() < _database_retry_at:
+            return
+        ensure_schema()
+        try:
+            install_change_triggers()
+        except psycopg2.Error:
+            logger.warning("Could not install dashboard triggers, refreshing every %s seconds", ROLLUP_REFRESH_SECONDS, exc_info=True)
+            _database_retry_at = time.monotonic() + ROLLUP_REFRESH_SECONDS
+            return
+        _triggers_installed = True
+        # CREATE INDEX CONCURRENTLY and CREATE TRIGGER on the same table
+        # deadlock: the indexes wait for the triggers
+        threading.Thread(target=ensure_concurrent_indexes, name='dashboard-indexes', daemon=True).start()
+        _database_ready = True
+
+if COLD_START:
+    load_snapshot()
+    ensure_warm_start()
+else:
+    try:
+        prepare_database()
+    except (psycopg2.Error, DatabaseUnavailable):
+        # Serve the degraded card until a request gets the schema ready
+        logger.warning("Could not prepare the dashboard database, retrying on the next request", exc_info=True)
+    _warm.set()
+
+def serve_layout():
+    try:
+        project_cube, singer_cube = get_cubes()
+    except (psycopg2.Error, DatabaseUnavailable):
+        logger.warning("Dashboard data unavailable", exc_info=True)
+        return dbc.Container([on_off_head, degraded_card()], fluid=True)
+    try:
+        singer = first_singer() if _warm.is_set() else _snapshot_first_singer
+    except (psycopg2.Error, DatabaseUnavailable):
+        # Fall back to the last known one, like the stale cubes
+        singer = _snapshot_first_singer
+    with stage('figure'):
+        layout = dashboard_layout(project_cube, singer_cube, singer)
+        components = {component.id: component for component in layout._traverse() if getattr(component, 'id', None)}
+        components['live-state'].data = live_state(
+            data_version(project_cube, singer_cube),
+            (None, None, {}),
+            {graph_id: components[graph_id].figure for graph_id in LIVE_PANELS},
+        )
+        return layout
+
+def dashboard_layout(project_cube, singer_cube, singer):
+    return dbc.Container(
+        [
+            on_off_head,
+            # Identifies the page for cancelling superseded queries
+            dcc.Store(id='session-id', data=uuid.uuid4().hex),
+            dbc.Row([
+                dbc.Col(
+                    dcc.DatePickerRange(
+                        id='date-range',
+                        display_format='DD/MM/YYYY',
+                        start_date_placeholder_text='Date de début',
+                        end_date_placeholder_text='Date de fin',
+                        clearable=True,
+                    ),
+                    className="mt-2"
+                ),
+                dbc.Col(
+                    [
+                        dbc.Switch(id='live-mode', label="Mise à jour en direct", value=LIVE_MODE_DEFAULT, className="me-3 mb-0"),
+                        html.Span(id='cross-filter-summary', className="me-2"),
+                        dbc.Button("Voir les projets", id='drilldown-open', color="primary", size="sm", className="me-2", disabled=True),
+                        dbc.Button("Réinitialiser les filtres", id='cross-filter-reset', color="secondary", size="sm"),
+                    ],
+                    className="mt-2 d-flex justify-content-end align-items-center"
+                ),
+            ]),
+            dcc.Store(id='cross-filter', data={}),
+            dbc.Row([
+                dbc.Col(singer_gender_graph(singer_cube)),
+                dbc.Col(singer_project_style(project_cube)),
+            ]),
+            dbc.Row([
+                dbc.Col(project_per_language(project_cube)),
+                dbc.Col(project_per_song_type(project_cube)),
+            ]),
+            dbc.Row([
+                dbc.Col(project_genres_graph(project_cube)),
+                dbc.Col(
+                    dbc.Card([
+                        dbc.CardHeader([
+                            html.H2("Projets par langue pour le chanteur", className="text-center"),
+                        ]),
+                        dbc.CardBody([
+                            dbc.Row([
+                                dcc.Input(
+                                    id='singer-search',
+                                    type='search',
+                                    placeholder='Rechercher un chanteur...',
+                                    debounce=SINGER_SEARCH_DEBOUNCE_SECONDS,
+                                    className="form-control mb-2",
+                                ),
+                            ]),
+                            dbc.Row([
                                 dcc.Dropdown(
-                                id='singer-dropdown',
-                                options=[{'label': singer, 'value': singer} for singer in singers],
-                                value=singers[0],
-                            ),
+                                    id='singer-dropdown',
+                                    options=[{'label': singer, 'value': singer}] if singer else [],
+                                    value=singer,
+                                ),
+                            ]),
+                            dbc.Row(id='singer-projects-graph')
+                        ])
+                    ], className="mt-2 mb-2")
+                )
+            ]),
+            dbc.Row([
+                dbc.Col(
+                    dbc.Card([
+                        dbc.CardHeader([
+                            html.H2("Comparaison des chanteurs par langue", className="text-center"),
                         ]),
-                        dbc.Row(id='singer-projects-graph')
-                    ])
-                ], className="mt-2 mb-2")
-            )
-        ]),
-        dbc.Row([
-            dbc.Col(project_file_category()),
-            dbc.Col(project_file_type())
-        ]),
-        dbc.Row([
-            dbc.Col(project_file_type_extension()),
-            dbc.Col(project_file_type_extension_per_file_category())
-        ])
-    ],
-    fluid=True,
+                        dbc.CardBody([
+                            dbc.Row([
+                                dcc.Input(
+                                    id='singer-compare-search',
+                                    type='search',
+                                    placeholder='Rechercher un chanteur...',
+                                    debounce=SINGER_SEARCH_DEBOUNCE_SECONDS,
+                                    className="form-control mb-2",
+                                ),
+                            ]),
+                            dbc.Row([
+                                dcc.Dropdown(
+                                    id='singer-compare-dropdown',
+                                    options=[{'label': singer, 'value': singer}] if singer else [],
+                                    value=[singer] if singer else [],
+                                    multi=True,
+                                    placeholder=f"Jusqu'à {SINGER_COMPARE_MAX} chanteurs",
+                                ),
+                            ]),
+                            dbc.Row(id='singer-compare-graph')
+                        ])
+                    ], className="mt-2 mb-2")
+                )
+            ]),
+            dbc.Row([
+                dbc.Col(project_file_category(project_cube)),
+                dbc.Col(project_file_type(project_cube))
+            ]),
+            dbc.Row([
+                dbc.Col(project_file_type_extension(project_cube)),
+                dbc.Col(project_file_type_extension_per_file_category(project_cube))
+            ]),
+            dbc.Collapse(
+                dbc.Card([
+                    dbc.CardHeader(html.H2(id='drilldown-title', className="text-center")),
+                    dbc.CardBody(id='drilldown-container'),
+                ], className="mt-2 mb-2"),
+                id='drilldown-collapse',
+                is_open=False,
+            ),
+            # Last clicked segment, listed by the "Voir les projets" button
+            dcc.Store(id='drilldown-segment'),
+            dcc.Store(id='drilldown-filter'),
+            dcc.Store(id='drilldown-cursors'),
+            dcc.Interval(id='live-interval', interval=LIVE_POLL_SECONDS * 1000, disabled=not LIVE_MODE_DEFAULT),
+            # Data version and panel digests the page currently shows
+            dcc.Store(id='live-state'),
+        ],
+        fluid=True,
+    )
+
+def empty_cubes():
+    rollup = pd.DataFrame(columns=list(ROLLUP_SCHEMA)).astype(ROLLUP_SCHEMA)
+    singers = pd.DataFrame(columns=['gender', 'count']).astype({'gender': 'category', 'count': 'int32'})
+    return OlapCube(rollup, ['day'] + ROLLUP_DIMENSIONS, ROLLUP_MEASURES), OlapCube(singers, ['gender'], ['count'])
+
+# Every component id for validating callbacks, including the drill-down grid
+# created later, so Dash does not call serve_layout (and wait for the data) at
+# import
+app.validation_layout = html.Div([dashboard_layout(*empty_cubes(), None), drilldown_grid()])
+app.layout = serve_layout
+
+@app.callback(
+    Output('cross-filter', 'data'),
+    Output('cross-filter-summary', 'children'),
+    *[Input(graph_id, 'clickData') for graph_id in CROSS_FILTER_GRAPHS],
+    Input('cross-filter-reset', 'n_clicks'),
+    State('cross-filter', 'data'),
+    prevent_initial_call=True
+)
+def update_cross_filter(*args):
+    cross_filter = dict(args[-1] or {})
+    if ctx.triggered_id == 'cross-filter-reset':
+        cross_filter = {}
+    else:
+        dimension = CROSS_FILTER_GRAPHS[ctx.triggered_id]
+        point = ctx.triggered[0]['value']['points'][0]
+        value = point['x'] if 'x' in point else point['label']
+        # Clicking the selected value again clears the filter
+        if cross_filter.get(dimension) == value:
+            cross_filter.pop(dimension)
+        else:
+            cross_filter[dimension] = value
+    summary = ", ".join(f"{dimension}: {value}" for dimension, value in cross_filter.items())
+    return cross_filter, summary
+
+@app.callback(
+    *[Output(graph_id, 'figure') for graph_id, _, _ in PROJECT_PANELS],
+    Input('date-range', 'start_date'),
+    Input('date-range', 'end_date'),
+    Input('cross-filter', 'data'),
+    prevent_initial_call=True
+)
+def filter_panels(start_date, end_date, cross_filter):
+    try:
+        project_cube, _ = get_cubes()
+    except (psycopg2.Error, DatabaseUnavailable):
+        raise PreventUpdate
+    return tuple(figure_patch(fig) for fig in panel_figures(project_cube, start_date, end_date, cross_filter).values())
+
+@app.callback(
+    Output('live-interval', 'disabled'),
+    Input('live-mode', 'value'),
+    prevent_initial_call=True
+)
+def toggle_live_mode(live):
+    return not live
+
+@app.callback(
+    *[Output(graph_id, 'figure', allow_duplicate=True) for graph_id in LIVE_PANELS],
+    Output('live-state', 'data'),
+    Input('live-interval', 'n_intervals'),
+    State('live-state', 'data'),
+    State('date-range', 'start_date'),
+    State('date-range', 'end_date'),
+    State('cross-filter', 'data'),
+    prevent_initial_call=True
+)
+def push_live_updates(_, state, start_date, end_date, cross_filter):
+    try:
+        project_cube, singer_cube = get_cubes()
+    except (psycopg2.Error, DatabaseUnavailable):
+        raise PreventUpdate
+    version = data_version(project_cube, singer_cube)
+    # Unchanged data costs an empty response
+    if state and state['version'] == version:
+        raise PreventUpdate
+    context = (start_date, end_date, cross_filter or {})
+    figures = {'singer-gender-graph': singer_gender_figure(singer_cube)}
+    figures.update(panel_figures(project_cube, *context))
+    new_state = live_state(version, context, figures)
+    # Digests only describe the page for the filters they were computed with
+    shown = state['digests'] if state and state['context'] == list(context) else {}
+    patches = [
+        figure_patch(figures[graph_id]) if new_state['digests'][graph_id] != shown.get(graph_id) else no_update
+        for graph_id in LIVE_PANELS
+    ]
+    return (*patches, new_state)
+
+@app.callback(
+    Output('singer-dropdown', 'options'),
+    Input('singer-search', 'value'),
+    State('singer-dropdown', 'value'),
+    State('session-id', 'data'),
+    prevent_initial_call=True
 )
+def update_singer_options(search, selected_singer, session_id):
+    try:
+        names = search_singers(search, cancel_key=('singer-search', session_id)) if search else []
+    except (psycopg2.Error, DatabaseUnavailable, QuerySuperseded):
+        raise PreventUpdate
+    # Keep the current selection displayable
+    if selected_singer and selected_singer not in names:
+        names = [selected_singer] + names
+    return [{'label': name, 'value': name} for name in names]
 
 @app.callback(
     Output('singer-projects-graph', 'children'),
-    Input('singer-dropdown', 'value')
+    Input('singer-dropdown', 'value'),
+    Input('date-range', 'start_date'),
+    Input('date-range', 'end_date'),
+    State('session-id', 'data')
 )
-def singer_projects_by_language_graph(selected_singer):
-    df = fetch_data("""
-        SELECT
-            s.name,
-            po.title,
-            po.language
-        FROM
-            singers s
-        JOIN
-            project_singer_association psa ON s.id = psa.singer_id
-        JOIN
-            project_observations po ON psa.project_observation_id = po.id
-        WHERE s.is_active = po.is_active AND s.name <> 'scraper'
-    """)
-    df = df.groupby(['name', 'language'])['title'].count().reset_index()
-    df.columns = ['name', 'language', 'project_count']
-    # df['language_label'] = df['language'].apply(
-    #     lambda lang: f"{lang} ({df.groupby('language')['project_count'].sum().to_dict()[lang]})"
-    # )
-    df = df[df['name'] == selected_singer]
+def singer_projects_by_language_graph(selected_singer, start_date, end_date, session_id):
+    figure_key = ('singer-projects', selected_singer, start_date, end_date)
+    try:
+        df = fetch_prepared(
+            'singer_projects_by_language',
+            (selected_singer, start_date, end_date),
+            cancel_key=('singer-projects', session_id),
+            schema={'language': 'category', 'project_count': 'int32'}
+        )
+    except QuerySuperseded:
+        raise PreventUpdate
+    except (psycopg2.Error, DatabaseUnavailable):
+        logger.warning("Singer projects query failed", exc_info=True)
+        fig = _last_figures.get(figure_key)
+        return dcc.Graph(figure=fig, config={'responsive': False}) if fig is not None else degraded_card()
 
-    fig = go.Figure(
-        data=[
-            go.Bar(
-                x=df['language'],
-                # x=df['language_label'],
-                y=df['project_count'],
-                text=df['project_count'],
-                marker=dict(
-                    color=list(range(len(df['language'].values))),
+    with stage('figure'):
+        fig = go.Figure(
+            data=[
+                go.Bar(
+                    x=df['language'],
+                    # x=df['language_label'],
+                    y=df['project_count'],
+                    text=df['project_count'],
+                    marker=dict(
+                        color=list(range(len(df['language'].values))),
+                    )
                 )
-            )
-        ]
-    )
+            ]
+        )
 
-    fig.update_layout(
-        title=f"Projets interprétés par {selected_singer  if selected_singer else 'No One'}",
-        xaxis_title='Langue',
-        # xaxis_title='Langue (total global)',
-        yaxis_title='Nombre de projets',
-        annotations=[
-            dict(
-                text=f"Total: {df['project_count'].sum()}",
-                x=1,
-                y=1.1,
-                xref='paper',
-                yref='paper',
-                showarrow=False,
-                font=dict(size=14),
-                align='right'
+        fig.update_layout(
+            title=f"Projets interprétés par {selected_singer  if selected_singer else 'No One'}",
+            xaxis_title='Langue',
+            # xaxis_title='Langue (total global)',
+            yaxis_title='Nombre de projets',
+            annotations=[
+                dict(
+                    text=f"Total: {df['project_count'].sum()}",
+                    x=1,
+                    y=1.1,
+                    xref='paper',
+                    yref='paper',
+                    showarrow=False,
+                    font=dict(size=14),
+                    align='right'
+                )
+            ]
+        )
+    remember_figure(figure_key, fig)
+    return dcc.Graph(figure=fig, config={'responsive': False})
+
+@app.callback(
+    Output('singer-compare-dropdown', 'options'),
+    Input('singer-compare-search', 'value'),
+    Input('singer-compare-dropdown', 'value'),
+    State('session-id', 'data'),
+    prevent_initial_call=True
+)
+def update_singer_compare_options(search, selected_singers, session_id):
+    selected_singers = list(dict.fromkeys(selected_singers or []))
+    try:
+        names = search_singers(search, cancel_key=('singer-compare-search', session_id)) if search else []
+    except (psycopg2.Error, DatabaseUnavailable, QuerySuperseded):
+        raise PreventUpdate
+    # Keep the selection displayable and stop offering singers past the cap
+    full = len(selected_singers) >= SINGER_COMPARE_MAX
+    return [{'label': name, 'value': name} for name in selected_singers] + [
+        {'label': name, 'value': name, 'disabled': full}
+        for name in names
+        if name not in selected_singers
+    ]
+
+@app.callback(
+    Output('singer-compare-graph', 'children'),
+    Input('singer-compare-dropdown', 'value'),
+    Input('date-range', 'start_date'),
+    Input('date-range', 'end_date'),
+    State('session-id', 'data')
+)
+def singer_compare_graph(selected_singers, start_date, end_date, session_id):
+    singers = list(dict.fromkeys(selected_singers or []))[:SINGER_COMPARE_MAX]
+    figure_key = ('singer-compare', tuple(singers), start_date, end_date)
+    if singers:
+        try:
+            # Every selected singer in one round-trip
+            df = fetch_prepared(
+                'singers_projects_by_language',
+                (singers, start_date, end_date),
+                cancel_key=('singer-compare', session_id),
+                schema={'project_count': 'int32'}
             )
-        ]
-    )
+        except QuerySuperseded:
+            raise PreventUpdate
+        except (psycopg2.Error, DatabaseUnavailable):
+            logger.warning("Singer comparison query failed", exc_info=True)
+            fig = _last_figures.get(figure_key)
+            return dcc.Graph(figure=fig, config={'responsive': False}) if fig is not None else degraded_card()
+    else:
+        df = pd.DataFrame(columns=['name', 'language', 'project_count'])
+
+    with stage('figure'):
+        # Languages x singers, in selection order, zero where a singer has no project
+        counts = df.pivot(index='language', columns='name', values='project_count').reindex(columns=singers).fillna(0).astype(int).sort_index()
+        fig = go.Figure(
+            data=[
+                go.Bar(
+                    name=singer,
+                    x=counts.index,
+                    y=counts[singer],
+                    text=counts[singer],
+                )
+                for singer in singers
+            ]
+        )
+
+        fig.update_layout(
+            barmode='group',
+            title="Projets par langue" if singers else "Aucun chanteur sélectionné",
+            xaxis_title='Langue',
+            yaxis_title='Nombre de projets',
+            legend_title='Chanteur',
+        )
+    remember_figure(figure_key, fig)
     return dcc.Graph(figure=fig, config={'responsive': False})
 
+def segment_label(segment):
+    return ", ".join(f"{dimension} {value}" for dimension, value in segment.items())
+
+@app.callback(
+    Output('drilldown-segment', 'data'),
+    Output('drilldown-open', 'children'),
+    Output('drilldown-open', 'disabled'),
+    *[Input(graph_id, 'clickData') for graph_id in DRILLDOWN_GRAPHS],
+    prevent_initial_call=True
+)
+def select_drilldown_segment(*args):
+    # Clicks cross-filter the panels: the grid only opens from the button
+    point = ctx.triggered[0]['value']['points'][0]
+    segment = {dimension: point[key] for dimension, key in DRILLDOWN_GRAPHS[ctx.triggered_id]}
+    return {'graph': ctx.triggered_id, 'segment': segment}, f"Voir les projets : {segment_label(segment)}", False
+
+@app.callback(
+    Output('drilldown-filter', 'data'),
+    Output('drilldown-cursors', 'data'),
+    Output('drilldown-title', 'children'),
+    Output('drilldown-container', 'children'),
+    Output('drilldown-collapse', 'is_open'),
+    Input('drilldown-open', 'n_clicks'),
+    State('drilldown-segment', 'data'),
+    State('date-range', 'start_date'),
+    State('date-range', 'end_date'),
+    State('cross-filter', 'data'),
+    prevent_initial_call=True
+)
+def open_drilldown(n_clicks, selected, start_date, end_date, cross_filter):
+    if not selected:
+        raise PreventUpdate
+    segment = dict(selected['segment'])
+    filters = {'day': (start_date, end_date)}
+    if selected['graph'] != 'singer-gender-graph':
+        # Same context as the panel: date range and the other cross-filters
+        filters.update(cross_filter or {})
+    title = "Projets : " + segment_label(segment)
+    for dimension, top_n in (('extension', EXTENSION_TOP_N), ('genre', GENRE_TOP_N)):
+        if segment.get(dimension) == OTHER_LABEL:
+            # Everything but the values the panel shows on their own
+            try:
+                project_cube, _ = get_cubes()
+            except (psycopg2.Error, DatabaseUnavailable):
+                raise PreventUpdate
+            segment[dimension] = {'exclude': top_n_labels(project_cube, dimension, top_n, filters)}
+    filters.update(segment)
+    # A new grid restarts the infinite row model on the new segment
+    return filters, {}, title, drilldown_grid(), True
+
+@app.callback(
+    Output('drilldown-grid', 'getRowsResponse'),
+    Output('drilldown-cursors', 'data', allow_duplicate=True),
+    Input('drilldown-grid', 'getRowsRequest'),
+    State('drilldown-filter', 'data'),
+    State('drilldown-cursors', 'data'),
+    prevent_initial_call=True
+)
+def drilldown_rows(request, filters, cursors):
+    # Block start row -> (created_at, id) of the row before it, per sort/filter
+    signature = json.dumps([request.get('sortModel'), request.get('filterModel')], sort_keys=True)
+    cursors = cursors if cursors and cursors.get('signature') == signature else {'signature': signature, 'keys': {}}
+    start_row, end_row = request['startRow'], request['endRow']
+    filters = {dimension: tuple(value) if dimension == 'day' else value for dimension, value in filters.items()}
+    try:
+        df, is_last_block = fetch_drilldown_rows(
+            filters,
+            start_row,
+            end_row,
+            request.get('sortModel'),
+            request.get('filterModel'),
+            cursors['keys'].get(str(start_row)),
+        )
+    except (psycopg2.Error, DatabaseUnavailable):
+        logger.warning("Drill-down query failed", exc_info=True)
+        return {'rowData': [], 'rowCount': start_row}, cursors
+    if len(df):
+        last = df.iloc[-1]
+        cursors['keys'][str(start_row + len(df))] = [last['created_at'], int(last['id'])]
+    response = {'rowData': df.to_dict('records')}
+    if is_last_block:
+        response['rowCount'] = start_row + len(df)
+    return response, cursors
+
+# Profiled Dash requests: the layout build and every callback invocation
+PROFILED_PATHS = ('/_dash-layout', '/_dash-update-component')
+
+def has_profile_token():
+    token = request.headers.get('X-Profile-Token', '')
+    return bool(PROFILE_ADMIN_TOKEN) and hmac.compare_digest(token.encode(), PROFILE_ADMIN_TOKEN.encode())
+
+@server.before_request
+def start_request_timing():
+    if not PROFILE_ADMIN_TOKEN or request.path not in PROFILED_PATHS:
+        return
+    name = 'layout'
+    if request.path == '/_dash-update-component':
+        output = (request.get_json(silent=True) or {}).get('output', '')
+        name = getattr(app.callback_map.get(output, {}).get('callback'), '__name__', output)
+    _request_timing.record = {
+        'name': name,
+        'started': time.perf_counter(),
+        'stages': defaultdict(float),
+        'nested': [],
+    }
+    _request_timing.sampler = StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_SECONDS).start() if has_profile_token() else None
+
+def prune_profiles():
+    # File names start with their timestamp: sorted oldest first
+    profiles = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith('.folded'))
+    for name in profiles[:max(len(profiles) - PROFILE_MAX_FILES, 0)]:
+        # Another worker may be pruning the same files
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(PROFILE_DIR, name))
+
+@server.after_request
+def finish_request_timing(response):
+    record = getattr(_request_timing, 'record', None)
+    if record is None:
+        return response
+    total = time.perf_counter() - record['started']
+    stages = dict(record['stages'])
+    # Time outside the instrumented stages is Dash encoding the response
+    stages['serialize'] = max(total - sum(stages.values()), 0.0)
+    timing = {
+        'name': record['name'],
+        'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'total_ms': total * 1000,
+        'stages_ms': {name: seconds * 1000 for name, seconds in sorted(stages.items(), key=lambda item: -item[1])},
+        'status': response.status_code,
+    }
+    sampler = getattr(_request_timing, 'sampler', None)
+    if sampler is not None:
+        sampler.stop()
+        _request_timing.sampler = None
+        os.makedirs(PROFILE_DIR, mode=0o700, exist_ok=True)
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^A-Za-z0-9_-]+', '_', record['name'])[:60]}-{uuid.uuid4().hex[:6]}.folded"
+        with open(os.path.join(PROFILE_DIR, filename), 'w') as profile:
+            profile.write(sampler.folded())
+        prune_profiles()
+        timing['flamegraph'] = filename
+        response.headers['X-Profile-Flamegraph'] = f'/_profile/flamegraphs/{filename}'
+    _request_timings.append(timing)
+    return response
+
+@server.teardown_request
+def clear_request_timing(error=None):
+    sampler = getattr(_request_timing, 'sampler', None)
+    if sampler is not None:
+        sampler.stop()
+    _request_timing.record = None
+    _request_timing.sampler = None
+
+@server.route('/_profile/slowest')
+def profile_slowest():
+    # Slowest recent layout builds and callbacks with their stage breakdown
+    if not has_profile_token():
+        abort(404)
+    limit = request.args.get('limit', PROFILE_TOP_N, type=int)
+    timings = sorted(list(_request_timings), key=lambda timing: timing['total_ms'], reverse=True)
+    return jsonify({'slowest': timings[:limit], 'statements': statement_stats()})
+
+@server.route('/_profile/flamegraphs/<path:filename>')
+def profile_flamegraph(filename):
+    # Folded stacks, render with flamegraph.pl or load into speedscope
+    if not has_profile_token():
+        abort(404)
+    return send_from_directory(os.path.abspath(PROFILE_DIR), filename, mimetype='text/plain')
+
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=10000)
     # app.run(debug=True, host="localhost", port=3000)
\ No newline at end of file
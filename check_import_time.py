@@ -0,0 +1,71 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+# Guards the cold-start import budget: imports app.py with COLD_START=1 and an
+# unreachable database, so any query or heavy import added at module level
+# shows up as a failure.
+#
+#   python check_import_time.py --budget 2.5
+#
+# tests/test_import_time.py runs the same check in the test suite.
+
+def default_budget():
+    return float(os.getenv('IMPORT_BUDGET_SECONDS', '3'))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fail when importing app.py in cold-start mode exceeds a time budget")
+    parser.add_argument('--budget', type=float, default=default_budget(), help="seconds")
+    parser.add_argument('--runs', type=int, default=3, help="imports to run, the fastest one is compared to the budget")
+    parser.add_argument('--top', type=int, default=15, help="slowest modules to list")
+    return parser.parse_args()
+
+def import_app():
+    env = dict(
+        os.environ,
+        COLD_START='1',
+        DASHBOARD_SNAPSHOT=os.devnull,
+        # Nothing listens there: the import must not wait on the database
+        POSTGRES_DB_HOST='127.0.0.1',
+        POSTGRES_PORT='9',
+        PROFILE_ADMIN_TOKEN='',
+    )
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit("Importing app.py failed")
+    return elapsed, result.stderr
+
+def slowest_modules(importtime, top):
+    # `-X importtime` lines are "self | cumulative | name", nested two spaces
+    # per level: depth 1 is what app.py imports directly
+    modules = []
+    for line in importtime.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$', line)
+        if match and len(match.group(3)) == 2:
+            modules.append((int(match.group(2)), match.group(4)))
+    return sorted(modules, reverse=True)[:top]
+
+def main():
+    args = parse_args()
+    runs = [import_app() for _ in range(args.runs)]
+    elapsed, importtime = min(runs)
+    print(f"import app: {elapsed:.2f}s (budget {args.budget:.2f}s, fastest of {args.runs})")
+    for cumulative, module in slowest_modules(importtime, args.top):
+        print(f"  {cumulative / 1e6:6.3f}s  {module}")
+    if elapsed > args.budget:
+        raise SystemExit(f"Import time {elapsed:.2f}s exceeds the {args.budget:.2f}s budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import argparse
+import bisect
+import http.client
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+
+import psycopg2
+
+# Replays dashboard sessions against a running instance (or a gunicorn it
+# spawns): page load, the callbacks the page fires on load, then singer changes
+# with Zipf-distributed singers separated by think time. Each change types a
+# prefix of the name into the singer search before picking it.
+#
+#   python loadtest.py --workers 2 --threads 4 --users 5,10,20,40 --duration 60
+
+PROJECTS_GRAPH_OUTPUT = 'singer-projects-graph.children'
+SINGER_SEARCH_OUTPUT = 'singer-dropdown.options'
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the dashboard with replayed sessions")
+    parser.add_argument('--url', default='http://127.0.0.1:8050', help="instance to test, ignored with --workers")
+    parser.add_argument('--workers', type=int, help="spawn gunicorn with this many workers")
+    parser.add_argument('--threads', type=int, default=1, help="gunicorn threads per worker")
+    parser.add_argument('--port', type=int, default=8050, help="port of the spawned gunicorn")
+    parser.add_argument('--users', default='10', help="concurrent users, a comma separated list runs one step per level")
+    parser.add_argument('--duration', type=float, default=60, help="seconds per step")
+    parser.add_argument('--ramp', type=float, default=5, help="seconds over which users start")
+    parser.add_argument('--think-time', type=float, default=2.0, help="mean seconds between singer changes")
+    parser.add_argument('--changes', type=int, default=10, help="singer changes per session before reloading the page")
+    parser.add_argument('--typed-chars', type=int, default=4, help="longest singer name prefix typed before picking")
+    parser.add_argument('--zipf', type=float, default=1.1, help="Zipf exponent of the singer popularity")
+    parser.add_argument('--p99-budget', type=float, default=1.0, help="seconds, used to report the supported user level")
+    parser.add_argument('--json', help="also write the results to this file")
+    return parser.parse_args()
+
+def load_singers():
+    # Singers ranked by project count, the most popular get most of the traffic
+    conn = psycopg2.connect(
+        dbname=os.getenv('POSTGRES_DB_NAME'),
+        user=os.getenv('POSTGRES_DB_USER'),
+        password=os.getenv('POSTGRES_DB_PASSWORD'),
+        host=os.getenv('POSTGRES_DB_HOST'),
+        port=os.getenv('POSTGRES_PORT'),
+    )
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT s.name
+                FROM singers s
+                LEFT JOIN project_singer_association psa ON psa.singer_id = s.id
+                WHERE s.name <> 'scraper'
+                GROUP BY s.id, s.name
+                ORDER BY count(psa.project_observation_id) DESC, s.name
+            """)
+            return [name for name, in cursor.fetchall()]
+    finally:
+        conn.close()
+
+class ZipfChooser:
+    def __init__(self, values, exponent):
+        self.values = values
+        self.cumulative = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, len(values) + 1)))
+
+    def choose(self, rng):
+        return self.values[bisect.bisect(self.cumulative, rng.random() * self.cumulative[-1])]
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, seconds, ok):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else float('nan')
+
+def find_value(component, component_id, prop):
+    # Initial property value of a component in the serialized layout
+    if isinstance(component, dict):
+        props = component.get('props', {})
+        if props.get('id') == component_id and prop in props:
+            return props[prop]
+        children = props.get('children')
+        return find_value(children, component_id, prop) if children is not None else None
+    if isinstance(component, list):
+        for child in component:
+            value = find_value(child, component_id, prop)
+            if value is not None:
+                return value
+    return None
+
+def initial_values(layout, dependency):
+    # Inputs and states of a callback as the page first renders them
+    return {
+        f"{item['id']}.{item['property']}": find_value(layout, item['id'], item['property'])
+        for item in dependency['inputs'] + dependency['state']
+    }
+
+def callback_payload(dependency, values):
+    def prop(item):
+        return dict(item, value=values.get(f"{item['id']}.{item['property']}"))
+    output = dependency['output']
+    if output.startswith('..'):
+        outputs = [
+            {'id': item.rsplit('.', 1)[0], 'property': item.rsplit('.', 1)[1]}
+            for item in output.strip('.').split('...')
+        ]
+    else:
+        outputs = {'id': output.rsplit('.', 1)[0], 'property': output.rsplit('.', 1)[1]}
+    inputs = [prop(item) for item in dependency['inputs']]
+    return {
+        'output': output,
+        'outputs': outputs,
+        'inputs': inputs,
+        'state': [prop(item) for item in dependency['state']],
+        'changedPropIds': [f"{inputs[0]['id']}.{inputs[0]['property']}"],
+    }
+
+class Session:
+    # One simulated browser tab with a keep-alive connection
+
+    def __init__(self, url, results, singers, args, rng):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.prefix = parsed.path.rstrip('/')
+        self.results = results
+        self.singers = singers
+        self.args = args
+        self.rng = rng
+        self.conn = None
+
+    def request(self, endpoint, method, path, body=None):
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        started = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self.conn.request(method, self.prefix + path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            # 204 is a callback raising PreventUpdate
+            ok = response.status in (200, 204)
+        except (OSError, http.client.HTTPException):
+            self.conn = None
+            data = b''
+            ok = False
+        self.results.record(endpoint, time.perf_counter() - started, ok)
+        return data if ok else None
+
+    def think(self, deadline):
+        time.sleep(max(0.0, min(self.rng.expovariate(1 / self.args.think_time), deadline - time.monotonic())))
+
+    def callback(self, dependency, values):
+        output = dependency['output']
+        return self.request(f'POST {output}', 'POST', '/_dash-update-component', callback_payload(dependency, values))
+
+    def type_search(self, singer, values, dependency, deadline):
+        # The search input is debounced: each pause while typing the prefix
+        # sends one search with what has been typed so far
+        typed = self.rng.randint(1, max(1, min(len(singer), self.args.typed_chars)))
+        pauses = sorted({self.rng.randint(1, typed) for _ in range(self.rng.randint(0, 2))} | {typed})
+        for length in pauses:
+            values['singer-search.value'] = singer[:length]
+            self.callback(dependency, values)
+            time.sleep(max(0.0, min(self.rng.uniform(0.3, 1.0), deadline - time.monotonic())))
+
+    def run(self, deadline):
+        while time.monotonic() < deadline:
+            self.request('GET /', 'GET', '/')
+            layout = self.request('GET /_dash-layout', 'GET', '/_dash-layout')
+            dependencies = self.request('GET /_dash-dependencies', 'GET', '/_dash-dependencies')
+            if layout is None or dependencies is None:
+                self.think(deadline)
+                continue
+            layout = json.loads(layout)
+            dependencies = {dependency['output']: dependency for dependency in json.loads(dependencies)}
+            # Callbacks the page fires on load, i.e. without prevent_initial_call
+            for dependency in dependencies.values():
+                if not dependency.get('prevent_initial_call') and not dependency.get('clientside_function'):
+                    self.callback(dependency, initial_values(layout, dependency))
+            values = {
+                **initial_values(layout, dependencies[SINGER_SEARCH_OUTPUT]),
+                **initial_values(layout, dependencies[PROJECTS_GRAPH_OUTPUT]),
+            }
+            for _ in range(self.args.changes):
+                self.think(deadline)
+                if time.monotonic() >= deadline:
+                    break
+                singer = self.singers.choose(self.rng)
+                self.type_search(singer, values, dependencies[SINGER_SEARCH_OUTPUT], deadline)
+                values['singer-dropdown.value'] = singer
+                self.callback(dependencies[PROJECTS_GRAPH_OUTPUT], values)
+        if self.conn is not None:
+            self.conn.close()
+
+def run_step(url, users, singers, args):
+    results = Results()
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = []
+    for user in range(users):
+        session = Session(url, results, singers, args, random.Random(user))
+        thread = threading.Thread(target=session.run, args=(deadline,), daemon=True)
+        threads.append(thread)
+        thread.start()
+        time.sleep(args.ramp / users)
+    for thread in threads:
+        thread.join()
+    return results, time.monotonic() - started
+
+def summarize(users, results, elapsed):
+    rows = []
+    for endpoint in sorted(results.latencies):
+        latencies = results.latencies[endpoint]
+        rows.append({
+            'users': users,
+            'endpoint': endpoint,
+            'requests': len(latencies),
+            'throughput_rps': len(latencies) / elapsed,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'error_rate': results.errors[endpoint] / len(latencies),
+        })
+    all_latencies = [latency for latencies in results.latencies.values() for latency in latencies]
+    total = {
+        'users': users,
+        'endpoint': 'all',
+        'requests': len(all_latencies),
+        'throughput_rps': len(all_latencies) / elapsed,
+        'p50_ms': percentile(all_latencies, 0.50) * 1000,
+        'p95_ms': percentile(all_latencies, 0.95) * 1000,
+        'p99_ms': percentile(all_latencies, 0.99) * 1000,
+        'error_rate': sum(results.errors.values()) / max(len(all_latencies), 1),
+    }
+    return rows + [total]
+
+def print_rows(rows):
+    print(f"{'users':>5}  {'endpoint':<42}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for row in rows:
+        print(
+            f"{row['users']:>5}  {row['endpoint']:<42}{row['requests']:>9}{row['throughput_rps']:>9.1f}"
+            f"{row['p50_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['p99_ms']:>9.0f}{row['error_rate']:>8.1%}"
+        )
+
+def start_gunicorn(args):
+    command = [
+        sys.executable, '-m', 'gunicorn', 'app:server',
+        '--workers', str(args.workers),
+        '--threads', str(args.threads),
+        '--bind', f'127.0.0.1:{args.port}',
+    ]
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)))
+    url = f'http://127.0.0.1:{args.port}'
+    # Wait until a worker has imported the app and serves the layout
+    for _ in range(120):
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn exited with code {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', args.port, timeout=5)
+            conn.request('GET', '/_dash-layout')
+            if conn.getresponse().status == 200:
+                return process, url
+        except OSError:
+            pass
+        time.sleep(1)
+    process.terminate()
+    raise SystemExit("gunicorn did not start serving in time")
+
+def main():
+    args = parse_args()
+    singers = load_singers()
+    if not singers:
+        raise SystemExit("No singers in the database")
+    chooser = ZipfChooser(singers, args.zipf)
+    process = None
+    url = args.url
+    if args.workers:
+        process, url = start_gunicorn(args)
+    all_rows = []
+    try:
+        for users in [int(level) for level in args.users.split(',')]:
+            results, elapsed = run_step(url, users, chooser, args)
+            rows = summarize(users, results, elapsed)
+            print_rows(rows)
+            print()
+            all_rows.extend(rows)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    supported = [row['users'] for row in all_rows if row['endpoint'] == 'all' and row['p99_ms'] <= args.p99_budget * 1000 and row['error_rate'] == 0]
+    config = f"{args.workers} workers x {args.threads} threads" if args.workers else url
+    print(f"{config}: {max(supported) if supported else 'no'} concurrent users within a p99 of {args.p99_budget}s")
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({'config': config, 'results': all_rows}, output, indent=2)
+
+if __name__ == "__main__":
+    main()
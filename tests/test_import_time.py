@@ -0,0 +1,8 @@
+import check_import_time
+
+# Cold-start import budget, see check_import_time.py for the module breakdown
+
+def test_cold_start_import_within_budget():
+    budget = check_import_time.default_budget()
+    elapsed = min(check_import_time.import_app()[0] for _ in range(3))
+    assert elapsed <= budget, f"Importing app.py took {elapsed:.2f}s, over the {budget:.2f}s budget"
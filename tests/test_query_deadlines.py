@@ -0,0 +1,59 @@
+import os
+import threading
+import time
+
+import psycopg2.errors
+import pytest
+from dotenv import load_dotenv
+
+# Deadlines, cancellation and the circuit breaker against a real Postgres,
+# configured through the same POSTGRES_* variables as the dashboard
+
+load_dotenv()
+pytestmark = pytest.mark.skipif(not os.getenv('POSTGRES_DB_HOST'), reason="no database configured (POSTGRES_DB_HOST)")
+
+@pytest.fixture(scope='module')
+def app():
+    import app
+    return app
+
+@pytest.fixture
+def breaker(app, monkeypatch):
+    circuit_breaker = app.CircuitBreaker(window=30, min_queries=2, error_rate=0.5, cooldown=1)
+    monkeypatch.setattr(app, 'circuit_breaker', circuit_breaker)
+    return circuit_breaker
+
+def test_statement_timeout_cancels_query(app, breaker):
+    started = time.monotonic()
+    with pytest.raises(psycopg2.errors.QueryCanceled):
+        app.fetch_data("SELECT pg_sleep(2)", timeout_ms=200)
+    assert time.monotonic() - started < 1.5
+
+def test_newer_query_supersedes_older_one(app, breaker):
+    outcome = {}
+
+    def first():
+        try:
+            app.fetch_data("SELECT pg_sleep(2)", cancel_key=('test', 'session'))
+            outcome['first'] = 'finished'
+        except app.QuerySuperseded:
+            outcome['first'] = 'superseded'
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    time.sleep(0.5)
+    second = app.fetch_data("SELECT 1 AS one", cancel_key=('test', 'session'))
+    thread.join()
+    assert outcome['first'] == 'superseded'
+    assert second['one'].tolist() == [1]
+    # Superseded queries are not database failures
+    assert all(ok for _, ok in breaker.outcomes)
+
+def test_breaker_opens_and_recovers(app, breaker):
+    for _ in range(2):
+        with pytest.raises(psycopg2.errors.QueryCanceled):
+            app.fetch_data("SELECT pg_sleep(1)", timeout_ms=50)
+    with pytest.raises(app.DatabaseUnavailable):
+        app.fetch_data("SELECT 1 AS one")
+    time.sleep(breaker.cooldown + 0.1)
+    assert app.fetch_data("SELECT 1 AS one")['one'].tolist() == [1]